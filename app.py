@@ -5,14 +5,23 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import pandas as pd
-import plotly.express as px
 from utils.auth import check_authentication, login_form, logout, get_current_user, send_password_reset
 from utils.supabase_client import get_supabase_client
-from utils.data_fetcher import fetch_all_products
+from utils.data_fetcher import get_products_dataset, invalidate_products_cache
+from utils.aggregations import get_marketplace_stats
+from utils.charts import get_figure
+from utils.server_aggregates import SERVER_AGGREGATES, get_server_marketplace_stats_async, invalidate_server_marketplace_stats
+from utils.async_data import gather, fetch_recent_products_async
+from utils.realtime import REALTIME_ENABLED, start_realtime_updates
+from utils.perf import start_trace, stage
+from utils.perf_panel import dataframe, plotly_chart, show_perf_panel
 
 # Load environment variables (for local development)
 load_dotenv()
 
+# Columns used by the overview
+PRODUCT_COLUMNS = ['name', 'marketplace', 'price', 'in_stock', 'scraped_at']
+
 # Page configuration
 st.set_page_config(
     page_title="Panini Scraper Dashboard",
@@ -21,6 +30,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+start_trace("Overview")
+
 # Check authentication
 if not check_authentication():
     login_form()
@@ -30,6 +41,10 @@ if not check_authentication():
 user = get_current_user()
 supabase = get_supabase_client()
 
+# Push scraper writes into the shared product cache as they happen
+if REALTIME_ENABLED:
+    start_realtime_updates()
+
 # Sidebar
 with st.sidebar:
     st.title("🎴 Panini Dashboard")
@@ -39,6 +54,11 @@ with st.sidebar:
     if st.button("🚪 Logout", use_container_width=True):
         logout()
     
+    if st.button("🔄 Refresh Data", use_container_width=True):
+        invalidate_products_cache()
+        invalidate_server_marketplace_stats()
+        st.toast("Product data is refreshing in the background.")
+    
     st.markdown("---")
     st.markdown("### Navigation")
     st.info("Use the pages in the sidebar to explore products and analytics.")
@@ -48,10 +68,24 @@ st.title("📊 Dashboard Overview")
 
 # Fetch data
 try:
-    # Fetch all products with pagination
-    products_df = fetch_all_products()
+    if SERVER_AGGREGATES:
+        # Summary rows computed by Postgres; no full table download.
+        # Both queries are in flight at once over the pooled async client.
+        with stage('supabase.overview'):
+            stats, recent_products = gather(
+                get_server_marketplace_stats_async(),
+                fetch_recent_products_async(limit=10, columns=PRODUCT_COLUMNS)
+            )
+    else:
+        # Fetch all products with pagination
+        dataset = get_products_dataset(columns=PRODUCT_COLUMNS)
+        products_df = dataset.frame
+        with stage('stats.compute', rows=len(products_df)):
+            stats = get_marketplace_stats(dataset)
+        with stage('recent.sort', rows=len(products_df)):
+            recent_products = products_df.sort_values('scraped_at', ascending=False).head(10) if 'scraped_at' in products_df.columns else None
     
-    if len(products_df) == 0:
+    if stats.total_products == 0:
         st.warning("No products found in database.")
         st.stop()
     
@@ -61,28 +95,26 @@ try:
     with col1:
         st.metric(
             label="Total Products",
-            value=len(products_df)
+            value=stats.total_products
         )
     
     with col2:
-        in_stock = products_df['in_stock'].sum() if 'in_stock' in products_df.columns else 0
         st.metric(
             label="In Stock",
-            value=int(in_stock)
+            value=stats.total_in_stock
         )
     
     with col3:
-        marketplaces = products_df['marketplace'].nunique() if 'marketplace' in products_df.columns else 0
         st.metric(
             label="Marketplaces",
-            value=marketplaces
+            value=stats.total_marketplaces
         )
     
     with col4:
-        avg_price = products_df['price'].str.replace('$', '').str.replace('.', '').astype(float).mean() if 'price' in products_df.columns else 0
+        avg_price = stats.avg_price
         st.metric(
             label="Avg Price",
-            value=f"${avg_price:,.0f}"
+            value=f"${avg_price:,.0f}" if pd.notna(avg_price) else "N/A"
         )
     
     st.markdown("---")
@@ -92,46 +124,20 @@ try:
     
     with col1:
         st.subheader("📦 Products by Marketplace")
-        if 'marketplace' in products_df.columns:
-            marketplace_counts = products_df['marketplace'].value_counts().reset_index()
-            marketplace_counts.columns = ['Marketplace', 'Count']
-            
-            fig = px.bar(
-                marketplace_counts,
-                x='Marketplace',
-                y='Count',
-                color='Marketplace',
-                title="Product Distribution"
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(get_figure('overview.marketplaces', stats), use_container_width=True)
     
     with col2:
         st.subheader("📊 Stock Status")
-        if 'in_stock' in products_df.columns:
-            stock_counts = products_df['in_stock'].value_counts().reset_index()
-            stock_counts.columns = ['Status', 'Count']
-            stock_counts['Status'] = stock_counts['Status'].map({True: 'In Stock', False: 'Out of Stock'})
-            
-            fig = px.pie(
-                stock_counts,
-                values='Count',
-                names='Status',
-                title="Stock Distribution",
-                color='Status',
-                color_discrete_map={'In Stock': '#00D26A', 'Out of Stock': '#FF4B4B'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(get_figure('overview.stock', stats), use_container_width=True)
     
     st.markdown("---")
     
     # Recent products
     st.subheader("🆕 Recently Updated Products")
-    if 'scraped_at' in products_df.columns:
-        recent_products = products_df.sort_values('scraped_at', ascending=False).head(10)
+    if recent_products is not None and 'scraped_at' in recent_products.columns:
         display_cols = ['name', 'marketplace', 'price', 'in_stock', 'scraped_at']
         display_cols = [col for col in display_cols if col in recent_products.columns]
-        st.dataframe(
+        dataframe(
             recent_products[display_cols],
             use_container_width=True,
             hide_index=True
@@ -142,3 +148,5 @@ try:
 except Exception as e:
     st.error(f"Error loading data: {str(e)}")
     st.info("Please check your Supabase connection and ensure the products table exists.")
+
+show_perf_panel(user)
@@ -0,0 +1,222 @@
+"""
+Offline benchmarks for the product data pipeline.
+
+Times loading (through the fake Supabase client, with simulated latency
+and the 1000-row cap), price parsing, schema preparation, search, sorting
+and the Analytics aggregations on synthetic catalogs, and saves the
+results as JSON so runs from different commits can be compared.
+
+Usage (from the repository root):
+    python -m benchmarks.run --sizes 1000 10000 100000
+    python -m benchmarks.run --compare benchmarks/results/<baseline>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_products
+from utils.aggregations import compute_marketplace_stats
+from utils.data_fetcher import fetch_products_from_supabase, prepare_products
+from utils.fake_supabase import FakeSupabaseClient
+from utils.prices import parse_clp_prices
+from utils.search_index import build_index
+from utils.supabase_client import set_supabase_client
+from utils.table_paging import sort_order
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SEARCH_QUERIES = ['sobre', 'mundial 2026', 'edicion esp', 'pokemon', 'album copa america', 'x50']
+
+# Median slowdown reported as a regression by --compare
+REGRESSION_THRESHOLD = 1.2
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(stage, repeat=3, memory=True):
+    """
+    Time a stage and record its peak traced memory.
+    
+    Args:
+        stage: Callable to benchmark
+        repeat: Timed runs
+        memory: Run once more under tracemalloc to record the peak allocation
+            (kept out of the timed runs, since tracing slows allocation down)
+    
+    Returns:
+        dict: runs, min_seconds, median_seconds and peak_bytes (None if not measured)
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - started)
+    
+    peak_bytes = None
+    if memory:
+        tracemalloc.start()
+        try:
+            stage()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    return {
+        'runs': repeat,
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'peak_bytes': peak_bytes,
+    }
+
+def benchmark_size(rows, repeat=3, latency=0.02, page_size=1000, workers=4, memory=True, seed=0):
+    """
+    Benchmark every stage on one synthetic catalog.
+    
+    Returns:
+        list: One result dict per stage
+    """
+    products = generate_products(rows, seed=seed)
+    client = FakeSupabaseClient(products, max_rows=page_size, latency=latency)
+    set_supabase_client(client)
+    
+    raw = pd.DataFrame(products)
+    frame = prepare_products(raw.copy())
+    index = build_index(frame)
+    
+    def fetch(max_workers):
+        return fetch_products_from_supabase(page_size=page_size, max_workers=max_workers, pagination='offset')
+    
+    stages = {
+        'fetch_sequential': lambda: fetch(1),
+        'fetch_parallel': lambda: fetch(workers),
+        'parse_prices': lambda: parse_clp_prices(raw['price']),
+        'prepare': lambda: prepare_products(raw.copy()),
+        'search_index_build': lambda: build_index(frame),
+        'search_queries': lambda: [index.search(query) for query in SEARCH_QUERIES],
+        'aggregate': lambda: compute_marketplace_stats(frame),
+        'sort_price': lambda: sort_order(frame['price_numeric']),
+    }
+    
+    results = []
+    for name, stage in stages.items():
+        requests_before = client.requests
+        result = measure(stage, repeat=repeat, memory=memory)
+        runs = repeat + (1 if memory else 0)
+        result.update({
+            'rows': rows,
+            'stage': name,
+            'requests_per_run': (client.requests - requests_before) / runs,
+        })
+        results.append(result)
+        print(f"{rows:>9,} rows  {name:<20} {result['median_seconds'] * 1000:>10.1f} ms"
+              + (f"  {result['peak_bytes'] / 1e6:>8.1f} MB peak" if result['peak_bytes'] is not None else ''))
+    
+    set_supabase_client(None)
+    return results
+
+def run(sizes=DEFAULT_SIZES, repeat=3, latency=0.02, page_size=1000, workers=4, memory=True, seed=0):
+    """
+    Run the benchmarks for every catalog size.
+    
+    Returns:
+        dict: 'meta' (environment and settings) and 'results'
+    """
+    results = []
+    for rows in sizes:
+        results.extend(benchmark_size(rows, repeat, latency, page_size, workers, memory, seed))
+    
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'settings': {
+                'sizes': list(sizes),
+                'repeat': repeat,
+                'latency': latency,
+                'page_size': page_size,
+                'workers': workers,
+                'seed': seed,
+            },
+        },
+        'results': results,
+    }
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare median timings of two result sets.
+    
+    Args:
+        baseline: Results dict from an earlier run
+        current: Results dict from this run
+        threshold: Slowdown ratio reported as a regression
+    
+    Returns:
+        list: (rows, stage, baseline seconds, current seconds, ratio) for
+            every stage present in both, slowest ratio first
+    """
+    previous = {(result['rows'], result['stage']): result['median_seconds'] for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        key = (result['rows'], result['stage'])
+        if key in previous and previous[key] > 0:
+            rows.append((*key, previous[key], result['median_seconds'], result['median_seconds'] / previous[key]))
+    rows.sort(key=lambda row: row[4], reverse=True)
+    
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    for size, stage, before, after, ratio in rows:
+        flag = '  REGRESSION' if ratio >= threshold else ''
+        print(f"{size:>9,} rows  {stage:<20} {before * 1000:>10.1f} -> {after * 1000:>10.1f} ms  x{ratio:.2f}{flag}")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Catalog sizes in rows')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated seconds per request')
+    parser.add_argument('--page-size', type=int, default=1000, help='Rows per page (and the fake max-rows cap)')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent page requests for fetch_parallel')
+    parser.add_argument('--seed', type=int, default=0, help='Catalog random seed')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory runs')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<time>_<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Earlier result file to compare with')
+    args = parser.parse_args(argv)
+    
+    report = run(args.sizes, args.repeat, args.latency, args.page_size, args.workers, not args.no_memory, args.seed)
+    
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == '__main__':
+    main()
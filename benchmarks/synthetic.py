@@ -0,0 +1,69 @@
+"""
+Synthetic product catalog shaped like the scraper's products table.
+"""
+import numpy as np
+import pandas as pd
+
+MARKETPLACES = ['Mercado Libre', 'Falabella', 'Paris', 'Ripley', 'Lider', 'Panini Store', 'Buscalibre']
+
+_KINDS = ['Sobre', 'Álbum', 'Caja', 'Lámina', 'Pack', 'Colección', 'Display', 'Blíster']
+_COLLECTIONS = [
+    'Mundial 2026', 'Copa América', 'Campeonato Nacional', 'Champions League',
+    'Liga de Campeones', 'Fútbol Chileno', 'Eliminatorias', 'Selección Chilena',
+    'Patrulla de Guerra', 'Pokémon Escarlata', 'Dragon Ball', 'Marvel Héroes',
+]
+_EDITIONS = ['', ' Edición Especial', ' Edición Oro', ' Tapa Dura', ' Tapa Blanda', ' Oficial', ' Limitada']
+_UNITS = ['', ' x5', ' x10', ' x25', ' x50', ' (Pack de 3)']
+
+def generate_products(rows, seed=0, start_id=1, days=90, until='2026-01-01'):
+    """
+    Generate product rows as Supabase returns them (JSON-like dicts).
+    
+    Prices are CLP strings with dot thousands separators ('$1.990',
+    '$148.900,00'), with ~3% missing or unparseable; names are Spanish with
+    accents; scraped_at timestamps spread over the `days` days before `until`.
+    
+    Args:
+        rows: Number of products
+        seed: Random seed; the same seed always yields the same catalog
+        start_id: First product id
+        days: Spread of the scraped_at timestamps
+        until: Newest possible scraped_at (fixed, so catalogs are reproducible)
+    
+    Returns:
+        list: Product dicts with id, name, marketplace, price, in_stock,
+            image_url, product_url and scraped_at
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(start_id, start_id + rows)
+    
+    names = pd.Series(np.array(_KINDS, dtype=object)[rng.integers(len(_KINDS), size=rows)])\
+        + ' ' + np.array(_COLLECTIONS, dtype=object)[rng.integers(len(_COLLECTIONS), size=rows)]\
+        + np.array(_EDITIONS, dtype=object)[rng.integers(len(_EDITIONS), size=rows)]\
+        + np.array(_UNITS, dtype=object)[rng.integers(len(_UNITS), size=rows)]
+    
+    # Log-normal prices around $10.000, ending in 990 like retail prices
+    amounts = (np.exp(rng.normal(9.2, 1.1, size=rows)) // 1000 * 1000 + 990).astype(np.int64)
+    prices = pd.Series(amounts).map('{:,}'.format).str.replace(',', '.', regex=False)
+    prices = '$' + prices + np.where(rng.random(rows) < 0.2, ',00', '')
+    missing = rng.random(rows)
+    prices = prices.astype(object)
+    prices[missing < 0.02] = None
+    prices[(missing >= 0.02) & (missing < 0.03)] = 'Consultar precio'
+    
+    seconds = rng.integers(days * 86400, size=rows)
+    scraped_at = (pd.Timestamp(until, tz='UTC') - pd.to_timedelta(seconds, unit='s'))\
+        .strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    
+    frame = pd.DataFrame({
+        'id': ids,
+        'name': names,
+        'marketplace': np.array(MARKETPLACES, dtype=object)[rng.integers(len(MARKETPLACES), size=rows)],
+        'price': prices,
+        'in_stock': rng.random(rows) < 0.7,
+        'image_url': 'https://img.example.cl/products/' + pd.Series(ids).astype(str) + '.jpg',
+        'product_url': 'https://tienda.example.cl/p/' + pd.Series(ids).astype(str),
+        'scraped_at': scraped_at,
+    })
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
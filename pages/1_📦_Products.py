@@ -1,11 +1,33 @@
 """
 Products page - Searchable and filterable product listing.
 """
+import os
+import time
 import streamlit as st
-import pandas as pd
 from utils.auth import check_authentication, get_current_user
 from utils.supabase_client import get_supabase_client
-from utils.data_fetcher import fetch_all_products
+from utils.data_fetcher import get_products_dataset, query_products
+from utils.product_filters import filter_mask, get_marketplaces
+from utils.server_aggregates import get_server_marketplace_stats
+from utils.export import EXPORT_FORMATS, available_formats, build_export, export_key, get_export
+from utils.product_cache import DEFAULT_TTL_SECONDS
+from utils.table_paging import PAGE_SIZES, get_sort_order, page_count, page_rows, sorted_positions
+from utils.realtime import REALTIME_ENABLED, start_realtime_updates
+from utils.perf import start_trace, stage, traced
+from utils.perf_panel import dataframe, show_perf_panel
+
+# Columns shown in the catalog table
+PRODUCT_COLUMNS = ['image_url', 'name', 'marketplace', 'price', 'in_stock', 'product_url', 'scraped_at']
+
+# Push filters down to Supabase and fetch one result page at a time
+# instead of filtering the full cached catalog locally
+SERVER_FILTERING = os.getenv("PRODUCTS_SERVER_FILTERING", "false").lower() == "true"
+RESULTS_PAGE_SIZE = 50
+
+# Sortable columns by label. Prices are stored as text in Supabase, so
+# server-side sorting by price would be lexicographic.
+SORT_OPTIONS = {'Price': 'price_numeric', 'Name': 'name', 'Marketplace': 'marketplace', 'Last Updated': 'scraped_at'}
+SERVER_SORT_OPTIONS = {'Name': 'name', 'Marketplace': 'marketplace', 'Last Updated': 'scraped_at'}
 
 # Check authentication
 if not check_authentication():
@@ -14,170 +36,239 @@ if not check_authentication():
 
 st.set_page_config(page_title="Products", page_icon="📦", layout="wide")
 
+start_trace("Products")
+
 user = get_current_user()
 supabase = get_supabase_client()
 
+# Push scraper writes into the shared product cache as they happen
+if REALTIME_ENABLED:
+    start_realtime_updates()
+
 st.title("📦 Product Catalog")
 
-# Fetch products
-try:
-    # Fetch all products with pagination
-    products_df = fetch_all_products()
-    
-    if len(products_df) == 0:
-        st.warning("No products found in database.")
-        st.stop()
-    
-    # Filters
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        marketplaces = ['All'] + sorted(products_df['marketplace'].unique().tolist())
-        selected_marketplace = st.selectbox("Marketplace", marketplaces)
-    
-    with col2:
-        stock_options = ['All', 'In Stock', 'Out of Stock']
-        selected_stock = st.selectbox("Stock Status", stock_options)
-    
-    with col3:
-        search_term = st.text_input("🔍 Search products", placeholder="e.g., Patrulla guerra")
-    
-    # Apply filters
-    filtered_df = products_df.copy()
-    
-    if selected_marketplace != 'All':
-        filtered_df = filtered_df[filtered_df['marketplace'] == selected_marketplace]
-    
-    if selected_stock == 'In Stock':
-        filtered_df = filtered_df[filtered_df['in_stock'] == True]
-    elif selected_stock == 'Out of Stock':
-        filtered_df = filtered_df[filtered_df['in_stock'] == False]
-    
-    # Multi-word search: all words must be present (AND logic)
-    if search_term:
-        # Split search term into words
-        search_words = search_term.lower().split()
-        
-        # Filter: all words must be present in the product name
-        def matches_all_words(name):
-            if pd.isna(name):
-                return False
-            name_lower = name.lower()
-            return all(word in name_lower for word in search_words)
-        
-        filtered_df = filtered_df[filtered_df['name'].apply(matches_all_words)]
-    
-    # Display results
-    st.markdown(f"**Showing {len(filtered_df)} of {len(products_df)} products**")
-    
-    # Prepare data for display
-    display_df = filtered_df.copy()
-    
-    # Add numeric price column for sorting (ignore decimals after comma)
-    if 'price' in display_df.columns:
-        def parse_price(price_str):
-            """
-            Parse price string to integer, removing formatting and decimals.
-            Examples:
-                $148.900,00 -> 148900
-                $12.990 -> 12990
-                $7.490 -> 7490
-            """
-            if pd.isna(price_str):
-                return 0
+@st.fragment
+@traced("Products (catalog)")
+def product_catalog(dataset, products_df, marketplaces):
+    """
+    Filters, table and export. Runs as a fragment: changing a filter, the
+    sort order or the page reruns only this function, against the data
+    loaded by the last full run of the page (no dataset in server mode).
+    """
+    try:
+        # Filters
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            selected_marketplace = st.selectbox("Marketplace", ['All'] + marketplaces)
+        
+        with col2:
+            stock_options = ['All', 'In Stock', 'Out of Stock']
+            selected_stock = st.selectbox("Stock Status", stock_options)
+        
+        with col3:
+            search_term = st.text_input("🔍 Search products", placeholder="e.g., Patrulla guerra")
+        
+        # Table controls
+        sort_options = SERVER_SORT_OPTIONS if SERVER_FILTERING else SORT_OPTIONS
+        sort_options = {label: column for label, column in sort_options.items() if SERVER_FILTERING or column in products_df.columns}
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            sort_label = st.selectbox("Sort by", list(sort_options))
+        
+        with col2:
+            sort_descending = st.selectbox("Order", ['Ascending', 'Descending']) == 'Descending'
+        
+        with col3:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(RESULTS_PAGE_SIZE))
+        
+        marketplace_filter = None if selected_marketplace == 'All' else selected_marketplace
+        stock_filter = {'In Stock': True, 'Out of Stock': False}.get(selected_stock)
+        
+        if SERVER_FILTERING:
+            page_number = st.number_input("Page", min_value=1, value=1, step=1)
             
-            # Convert to string and remove $
-            price_str = str(price_str).replace('$', '').strip()
+            display_df, total_results = query_products(
+                marketplace=marketplace_filter,
+                in_stock=stock_filter,
+                search_words=search_term.split(),
+                page=page_number,
+                page_size=page_size,
+                columns=PRODUCT_COLUMNS,
+                order_by=sort_options[sort_label],
+                descending=sort_descending
+            )
             
-            # Split by comma to remove decimals (,00)
-            if ',' in price_str:
-                price_str = price_str.split(',')[0]
+            # Display results
+            st.markdown(f"**Showing {len(display_df)} of {total_results} matching products (page {page_number} of {page_count(total_results, page_size)})**")
             
-            # Remove dots (thousands separator)
-            price_str = price_str.replace('.', '')
+            if len(display_df) == 0:
+                st.info("No products match the selected filters.")
+                return
+        else:
+            # Filter with one boolean mask over the shared frame; nothing is copied.
+            # Each predicate's mask is cached per dataset version, so changing one
+            # filter only evaluates that one. Multi-word search: every word must
+            # prefix a word of the name (AND logic), ignoring case and accents.
+            with stage('filter', rows=len(products_df)):
+                mask = filter_mask(dataset, marketplace=marketplace_filter, in_stock=stock_filter, search=search_term)
             
-            # Convert to int
-            try:
-                return int(price_str)
-            except:
-                return 0
-        
-        display_df['price_numeric'] = display_df['price'].apply(parse_price)
-        # Sort by price numeric by default
-        display_df = display_df.sort_values('price_numeric', ascending=True)
-    
-    # Select columns to display
-    display_columns = ['image_url', 'name', 'marketplace', 'price', 'in_stock', 'product_url', 'scraped_at']
-    display_columns = [col for col in display_columns if col in display_df.columns]
-    
-    # Column configuration with proper types
-    column_config = {
-        'image_url': st.column_config.ImageColumn(
-            'Image',
-            width='small',
-            help="Product image"
-        ),
-        'name': st.column_config.TextColumn(
-            'Product Name',
-            width='large',
-            help="Product name"
-        ),
-        'marketplace': st.column_config.TextColumn(
-            'Marketplace',
-            width='small'
-        ),
-        'price': st.column_config.NumberColumn(
-            'Price',
-            width='small',
-            format="$%d",
-            help="Price in CLP (sorted numerically)"
-        ),
-        'in_stock': st.column_config.CheckboxColumn(
-            'In Stock',
-            width='small'
-        ),
-        'product_url': st.column_config.LinkColumn(
-            'Link',
-            width='small',
-            display_text="View"
-        ),
-        'scraped_at': st.column_config.DatetimeColumn(
-            'Last Updated',
-            width='medium',
-            format="DD/MM/YY HH:mm"
+            # The sort order is computed once per dataset version and reused by every rerun
+            with stage('sort') as timing:
+                order = get_sort_order(dataset, sort_options[sort_label], descending=sort_descending)
+                positions = sorted_positions(order, mask)
+                timing.rows = total_results = len(positions)
+            
+            if total_results == 0:
+                st.info("No products match the selected filters.")
+                return
+            
+            total_pages = page_count(total_results, page_size)
+            page_number = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+            
+            # Only the visible page's displayed columns are copied and sent to the
+            # browser, with the numeric price shown in place of the price text
+            visible_columns = [
+                'price_numeric' if column == 'price' and 'price_numeric' in products_df.columns else column
+                for column in PRODUCT_COLUMNS if column in products_df.columns
+            ]
+            display_df = page_rows(products_df, positions, page_number, page_size, columns=visible_columns)\
+                .rename(columns={'price_numeric': 'price'})
+            
+            # Display results
+            st.markdown(f"**Showing {len(display_df)} of {total_results} matching products ({len(products_df)} total, page {page_number} of {total_pages})**")
+        
+        # Select columns to display
+        display_columns = ['image_url', 'name', 'marketplace', 'price', 'in_stock', 'product_url', 'scraped_at']
+        display_columns = [col for col in display_columns if col in display_df.columns]
+        
+        # Column configuration with proper types
+        column_config = {
+            'image_url': st.column_config.ImageColumn(
+                'Image',
+                width='small',
+                help="Product image"
+            ),
+            'name': st.column_config.TextColumn(
+                'Product Name',
+                width='large',
+                help="Product name"
+            ),
+            'marketplace': st.column_config.TextColumn(
+                'Marketplace',
+                width='small'
+            ),
+            'price': st.column_config.NumberColumn(
+                'Price',
+                width='small',
+                format="$%d",
+                help="Price in CLP (sorted numerically)"
+            ),
+            'in_stock': st.column_config.CheckboxColumn(
+                'In Stock',
+                width='small'
+            ),
+            'product_url': st.column_config.LinkColumn(
+                'Link',
+                width='small',
+                display_text="View"
+            ),
+            'scraped_at': st.column_config.DatetimeColumn(
+                'Last Updated',
+                width='medium',
+                format="DD/MM/YY HH:mm"
+            )
+        }
+        
+        # Replace price string with numeric for display (server results)
+        if 'price' in display_df.columns and 'price_numeric' in display_df.columns:
+            display_df = display_df.assign(price=display_df['price_numeric'])
+        
+        # Remove price_numeric from display
+        final_display_cols = [col for col in display_columns if col != 'price_numeric']
+        
+        dataframe(
+            display_df[final_display_cols],
+            use_container_width=True,
+            hide_index=True,
+            column_config=column_config
         )
-    }
-    
-    # Replace price string with numeric for display
-    if 'price' in display_df.columns and 'price_numeric' in display_df.columns:
-        display_df['price'] = display_df['price_numeric']
-    
-    # Remove price_numeric from display
-    final_display_cols = [col for col in display_columns if col != 'price_numeric']
-    
-    st.dataframe(
-        display_df[final_display_cols],
-        use_container_width=True,
-        hide_index=True,
-        column_config=column_config
-    )
+        
+        # Export: built on request only, then cached per dataset version and filters
+        st.markdown("---")
+        col1, col2, col3 = st.columns([1, 1, 4])
+        
+        with col1:
+            export_format = st.selectbox(
+                "Export format",
+                available_formats(),
+                format_func=lambda fmt: EXPORT_FORMATS[fmt][0]
+            )
+            
+            if SERVER_FILTERING:
+                # Only the current page is held locally, so that is what gets exported.
+                # Nothing versions server results, so a cached page export is reused
+                # for at most one cache TTL, like the local catalog.
+                export_version = ('server', int(time.time() // DEFAULT_TTL_SECONDS), page_number, page_size)
+                export_frame, export_positions = display_df, None
+            else:
+                export_version = dataset.version
+                export_frame, export_positions = products_df, positions
+            
+            filter_signature = (selected_marketplace, selected_stock, search_term, sort_label, sort_descending)
+            key = export_key(export_version, filter_signature, export_format)
+            
+            # The file is only handed to the download button on the run the
+            # button is clicked, not on every paging or sorting rerun after it
+            export = None
+            if st.button("📦 Prepare download", use_container_width=True):
+                export = get_export(key)
+                if export is None:
+                    with st.spinner("Preparing export..."):
+                        with stage('export.build', rows=total_results):
+                            export = build_export(key, export_frame, export_positions, fmt=export_format)
+            
+            if export is not None:
+                with export.open() as export_file:
+                    st.download_button(
+                        label=f"📥 Download {EXPORT_FORMATS[export_format][0]}",
+                        data=export_file,
+                        file_name=export.file_name,
+                        mime=export.mime,
+                        use_container_width=True
+                    )
+        
+        with col2:
+            st.metric("Total Results", total_results)
     
-    # Export button
-    st.markdown("---")
-    col1, col2, col3 = st.columns([1, 1, 4])
+    except Exception as e:
+        st.error(f"Error loading products: {str(e)}")
+
+# Fetch products
+try:
+    if SERVER_FILTERING:
+        # Only the marketplace names are needed up front: one row per
+        # marketplace from the marketplace_stats view, cached like Analytics'
+        stats = get_server_marketplace_stats()
+        dataset = products_df = None
+        total_products = stats.total_products
+        marketplaces = sorted(stats.by_marketplace['marketplace'].tolist())
+    else:
+        # Fetch all products with pagination
+        dataset = get_products_dataset(columns=PRODUCT_COLUMNS)
+        products_df = dataset.frame
+        total_products = len(products_df)
+        marketplaces = get_marketplaces(dataset)
     
-    with col1:
-        csv = filtered_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name="products.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+    if total_products == 0:
+        st.warning("No products found in database.")
+        st.stop()
     
-    with col2:
-        st.metric("Total Results", len(filtered_df))
+    product_catalog(dataset, products_df, marketplaces)
 
 except Exception as e:
     st.error(f"Error loading products: {str(e)}")
+
+show_perf_panel(user)
@@ -3,11 +3,18 @@ Analytics page - Charts and visualizations for product data.
 """
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.auth import check_authentication
+from utils.auth import check_authentication, get_current_user
 from utils.supabase_client import get_supabase_client
-from utils.data_fetcher import fetch_all_products
+from utils.data_fetcher import get_products_dataset
+from utils.aggregations import HISTOGRAM_BINS, get_marketplace_stats
+from utils.charts import get_figure
+from utils.server_aggregates import SERVER_AGGREGATES, get_server_marketplace_stats
+from utils.realtime import REALTIME_ENABLED, start_realtime_updates
+from utils.perf import start_trace, stage, traced
+from utils.perf_panel import dataframe, plotly_chart, show_perf_panel
+
+# Columns used by the charts and comparison table
+PRODUCT_COLUMNS = ['marketplace', 'price', 'in_stock']
 
 # Check authentication
 if not check_authentication():
@@ -16,114 +23,99 @@ if not check_authentication():
 
 st.set_page_config(page_title="Analytics", page_icon="📊", layout="wide")
 
+start_trace("Analytics")
+
 supabase = get_supabase_client()
 
+# Push scraper writes into the shared product cache as they happen
+if REALTIME_ENABLED:
+    start_realtime_updates()
+
 st.title("📊 Analytics & Insights")
 
+@st.fragment
+@traced("Analytics (price distribution)")
+def price_distribution(dataset):
+    """
+    Price histogram with its own bin slider. Runs as a fragment: moving the
+    slider only rebins the prices, without reloading or re-aggregating the
+    rest of the page.
+    """
+    bins = st.slider("Price bins", min_value=10, max_value=100, value=HISTOGRAM_BINS, step=5)
+    
+    # Pre-binned counts, cached per dataset version (or fetched from Postgres) and bin count
+    if dataset is None:
+        with stage('supabase.stats'):
+            stats = get_server_marketplace_stats(bins=bins)
+    else:
+        with stage('stats.compute', rows=len(dataset.frame)):
+            stats = get_marketplace_stats(dataset, bins=bins)
+    
+    plotly_chart(get_figure('analytics.price_distribution', stats), use_container_width=True)
+
 # Fetch products
 try:
-    # Fetch all products with pagination
-    products_df = fetch_all_products()
-    
-    if len(products_df) == 0:
+    if SERVER_AGGREGATES:
+        # Statistics computed by Postgres; no full table download
+        dataset = None
+        with stage('supabase.stats'):
+            stats = get_server_marketplace_stats()
+    else:
+        # Fetch all products with pagination; all statistics come from one
+        # aggregation pass, cached per dataset version
+        dataset = get_products_dataset(columns=PRODUCT_COLUMNS)
+        with stage('stats.compute', rows=len(dataset.frame)):
+            stats = get_marketplace_stats(dataset)
+    
+    if stats.total_products == 0:
         st.warning("No products found in database.")
         st.stop()
     
+    by_marketplace = stats.by_marketplace
+    has_prices = bool(stats.by_marketplace['priced'].sum())
+    
     # Marketplace Analysis
     st.header("🏪 Marketplace Analysis")
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # Products per marketplace
-        marketplace_counts = products_df['marketplace'].value_counts().reset_index()
-        marketplace_counts.columns = ['Marketplace', 'Products']
-        
-        fig = px.bar(
-            marketplace_counts,
-            x='Marketplace',
-            y='Products',
-            title="Products per Marketplace",
-            color='Products',
-            color_continuous_scale='Viridis'
-        )
-        fig.update_layout(showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(get_figure('analytics.marketplaces', stats), use_container_width=True)
     
     with col2:
         # Stock status by marketplace
-        if 'in_stock' in products_df.columns:
-            stock_by_marketplace = products_df.groupby(['marketplace', 'in_stock']).size().reset_index(name='count')
-            stock_by_marketplace['in_stock'] = stock_by_marketplace['in_stock'].map({True: 'In Stock', False: 'Out of Stock'})
-            
-            fig = px.bar(
-                stock_by_marketplace,
-                x='marketplace',
-                y='count',
-                color='in_stock',
-                title="Stock Status by Marketplace",
-                barmode='group',
-                color_discrete_map={'In Stock': '#00D26A', 'Out of Stock': '#FF4B4B'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        if stats.total_in_stock + stats.total_out_of_stock > 0:
+            plotly_chart(get_figure('analytics.stock', stats), use_container_width=True)
     
     st.markdown("---")
     
     # Price Analysis
     st.header("💰 Price Analysis")
     
-    # Extract numeric prices
-    if 'price' in products_df.columns:
-        products_df['price_numeric'] = products_df['price'].str.replace('$', '').str.replace('.', '').str.replace(',', '').astype(float, errors='ignore')
-        
+    # Numeric prices are parsed once when the data is loaded
+    if has_prices:
         col1, col2 = st.columns(2)
         
         with col1:
-            # Price distribution
-            fig = px.histogram(
-                products_df,
-                x='price_numeric',
-                nbins=30,
-                title="Price Distribution",
-                labels={'price_numeric': 'Price (CLP)'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            price_distribution(dataset)
         
         with col2:
-            # Average price by marketplace
-            avg_price_by_marketplace = products_df.groupby('marketplace')['price_numeric'].mean().reset_index()
-            avg_price_by_marketplace.columns = ['Marketplace', 'Average Price']
-            
-            fig = px.bar(
-                avg_price_by_marketplace,
-                x='Marketplace',
-                y='Average Price',
-                title="Average Price by Marketplace",
-                color='Average Price',
-                color_continuous_scale='Blues'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(get_figure('analytics.average_price', stats), use_container_width=True)
     
     st.markdown("---")
     
     # Marketplace Comparison Table
     st.header("📋 Marketplace Comparison")
     
-    comparison_data = []
-    for marketplace in products_df['marketplace'].unique():
-        marketplace_df = products_df[products_df['marketplace'] == marketplace]
-        
-        comparison_data.append({
-            'Marketplace': marketplace,
-            'Total Products': len(marketplace_df),
-            'In Stock': marketplace_df['in_stock'].sum() if 'in_stock' in marketplace_df.columns else 0,
-            'Avg Price': f"${marketplace_df['price_numeric'].mean():,.0f}" if 'price_numeric' in marketplace_df.columns else 'N/A',
-            'Min Price': f"${marketplace_df['price_numeric'].min():,.0f}" if 'price_numeric' in marketplace_df.columns else 'N/A',
-            'Max Price': f"${marketplace_df['price_numeric'].max():,.0f}" if 'price_numeric' in marketplace_df.columns else 'N/A'
-        })
-    
-    comparison_df = pd.DataFrame(comparison_data)
-    st.dataframe(comparison_df, use_container_width=True, hide_index=True)
+    comparison_df = pd.DataFrame({
+        'Marketplace': by_marketplace['marketplace'],
+        'Total Products': by_marketplace['products'],
+        'In Stock': by_marketplace['in_stock'],
+        'Avg Price': by_marketplace['avg_price'].map(lambda price: f"${price:,.0f}") if has_prices else 'N/A',
+        'Min Price': by_marketplace['min_price'].map(lambda price: f"${price:,.0f}") if has_prices else 'N/A',
+        'Max Price': by_marketplace['max_price'].map(lambda price: f"${price:,.0f}") if has_prices else 'N/A'
+    })
+    dataframe(comparison_df, use_container_width=True, hide_index=True)
     
     st.markdown("---")
     
@@ -133,18 +125,20 @@ try:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Products", len(products_df))
+        st.metric("Total Products", stats.total_products)
     
     with col2:
-        st.metric("Total Marketplaces", products_df['marketplace'].nunique())
+        st.metric("Total Marketplaces", stats.total_marketplaces)
     
     with col3:
-        if 'price_numeric' in products_df.columns:
-            st.metric("Highest Price", f"${products_df['price_numeric'].max():,.0f}")
+        if has_prices:
+            st.metric("Highest Price", f"${stats.max_price:,.0f}")
     
     with col4:
-        if 'price_numeric' in products_df.columns:
-            st.metric("Lowest Price", f"${products_df['price_numeric'].min():,.0f}")
+        if has_prices:
+            st.metric("Lowest Price", f"${stats.min_price:,.0f}")
 
 except Exception as e:
     st.error(f"Error loading analytics: {str(e)}")
+
+show_perf_panel(get_current_user())
@@ -3,7 +3,7 @@ Password Reset page - Handles password reset token from Supabase.
 This page is accessed when user clicks the reset link in their email.
 """
 import streamlit as st
-from utils.supabase_client import get_supabase_client
+from utils.auth import get_user_client
 import urllib.parse
 
 st.set_page_config(page_title="Reset Password", page_icon="🔐", layout="centered")
@@ -34,7 +34,7 @@ if "access_token" in query_params or "token" in query_params:
                 st.error("Password must be at least 6 characters long.")
             else:
                 try:
-                    supabase = get_supabase_client()
+                    supabase = get_user_client()
                     
                     # Update password using the token
                     response = supabase.auth.update_user({
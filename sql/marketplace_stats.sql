@@ -0,0 +1,63 @@
+-- Server-side aggregates for the dashboard (see utils/server_aggregates.py).
+-- Run once in the Supabase SQL editor. Enable in the app with
+-- PRODUCT_SERVER_AGGREGATES=true.
+
+-- Whole CLP pesos from a price string: '$148.900,00' -> 148900.
+-- Mirrors utils/prices.parse_clp_prices.
+create or replace function public.parse_clp_price(price text)
+returns bigint
+language sql
+immutable
+as $$
+    select nullif(replace(substring(price from '\d[\d.]*'), '.', ''), '')::bigint
+$$;
+
+-- One row per marketplace, plus one with a null marketplace for products
+-- without one (counted in the totals, like the local aggregation).
+create or replace view public.marketplace_stats as
+select
+    marketplace,
+    count(*) as products,
+    count(*) filter (where in_stock) as in_stock,
+    count(*) filter (where not in_stock) as out_of_stock,
+    count(public.parse_clp_price(price)) as priced,
+    avg(public.parse_clp_price(price))::double precision as avg_price,
+    min(public.parse_clp_price(price))::double precision as min_price,
+    max(public.parse_clp_price(price))::double precision as max_price
+from public.products
+group by marketplace;
+
+-- Equal-width price histogram, matching numpy.histogram bucket edges.
+create or replace function public.price_histogram(bins integer default 30)
+returns table (bin_start double precision, bin_end double precision, count bigint)
+language sql
+stable
+as $$
+    with prices as (
+        select public.parse_clp_price(price)::double precision as price
+        from public.products
+        where public.parse_clp_price(price) is not null
+    ),
+    bounds as (
+        -- numpy widens a zero-width range to +/- 0.5
+        select
+            case when min(price) = max(price) then min(price) - 0.5 else min(price) end as low,
+            case when min(price) = max(price) then max(price) + 0.5 else max(price) end as high
+        from prices
+    ),
+    buckets as (
+        -- width_bucket puts the maximum in bucket bins + 1; fold it into the last bucket
+        select least(width_bucket(price, low, high, bins), bins) as bucket, count(*) as count
+        from prices, bounds
+        group by 1
+    )
+    select
+        low + (bucket_number - 1) * (high - low) / bins,
+        low + bucket_number * (high - low) / bins,
+        coalesce(buckets.count, 0)
+    from bounds
+    cross join generate_series(1, bins) as bucket_number
+    left join buckets on buckets.bucket = bucket_number
+    where low is not null
+    order by bucket_number
+$$;
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests run offline: no snapshot files, no realtime subscription
+os.environ.setdefault("PRODUCT_SNAPSHOTS", "false")
+os.environ.setdefault("PRODUCT_REALTIME", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import aggregations
+from utils.aggregations import compute_marketplace_stats, get_marketplace_stats, price_histogram
+from utils.product_cache import CachedDataset
+
+def _products():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4, 5],
+        'marketplace': ['Paris', 'Paris', 'Ripley', 'Ripley', 'Falabella'],
+        'in_stock': [True, False, True, True, None],
+        'price_numeric': pd.array([1000, 3000, None, 2000, 10000], dtype='Int64'),
+    })
+
+@pytest.fixture(autouse=True)
+def stats_cache(monkeypatch):
+    monkeypatch.setattr(aggregations, '_stats_cache', {})
+
+def test_empty_table_gives_zeroed_stats():
+    # An empty products table loads as a frame without columns
+    stats = compute_marketplace_stats(pd.DataFrame([]))
+    
+    assert stats.total_products == 0
+    assert stats.total_marketplaces == 0
+    assert stats.total_in_stock == 0
+    assert stats.price_histogram.empty
+
+def test_stats_are_computed_per_marketplace():
+    stats = compute_marketplace_stats(_products())
+    by_marketplace = stats.by_marketplace.set_index('marketplace')
+    
+    assert stats.total_products == 5
+    assert stats.total_in_stock == 3
+    assert by_marketplace.loc['Paris', ['products', 'in_stock', 'out_of_stock', 'priced']].tolist() == [2, 1, 1, 2]
+    assert by_marketplace.loc['Ripley', 'avg_price'] == 2000
+    # Mean over priced products, not over marketplace means
+    assert stats.avg_price == 4000
+    assert (stats.min_price, stats.max_price) == (1000, 10000)
+
+def test_stats_are_memoized_per_version_and_bins():
+    frame = _products()
+    dataset = CachedDataset(frame, version=1, loaded_at=time.time())
+    
+    first = get_marketplace_stats(dataset)
+    assert get_marketplace_stats(CachedDataset(frame, version=1, loaded_at=time.time())) is first
+    assert get_marketplace_stats(dataset, bins=5) is not first
+    
+    updated = CachedDataset(frame.iloc[:2], version=2, loaded_at=time.time())
+    assert get_marketplace_stats(updated).total_products == 2
+
+def test_histogram_bins_match_numpy():
+    prices = pd.Series(pd.array([1000, 3000, None, 2000, 10000], dtype='Int64'))
+    
+    histogram = price_histogram(prices, bins=3)
+    counts, edges = np.histogram([1000, 3000, 2000, 10000], bins=3)
+    
+    assert histogram['count'].tolist() == counts.tolist()
+    assert histogram['bin_start'].tolist() == edges[:-1].tolist()
+    assert histogram['bin_end'].tolist() == edges[1:].tolist()
+    # Missing prices are left out; the last bin includes the maximum
+    assert histogram['count'].sum() == 4
@@ -0,0 +1,37 @@
+import pytest
+
+from utils import server_aggregates
+from utils.async_data import fetch_recent_products_async, gather
+from utils.fake_supabase import FakeSupabaseClient
+from utils.server_aggregates import get_server_marketplace_stats_async
+from utils.supabase_client import set_supabase_client
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server_aggregates, '_server_stats', {})
+    client = FakeSupabaseClient([
+        {
+            'id': product_id,
+            'name': f'Sobre {product_id}',
+            'marketplace': 'Paris' if product_id % 2 else 'Ripley',
+            'price': f'${product_id}.990',
+            'in_stock': product_id % 3 != 0,
+            'scraped_at': f'2026-01-01T00:{product_id:02d}:00+00:00',
+        }
+        for product_id in range(1, 11)
+    ], latency=0.01)
+    set_supabase_client(client)
+    yield client
+    set_supabase_client(None)
+
+def test_overview_queries_run_on_the_injected_client(client):
+    stats, recent = gather(
+        get_server_marketplace_stats_async(),
+        fetch_recent_products_async(limit=3, columns=['name', 'scraped_at']),
+        timeout=10,
+    )
+    
+    assert stats.total_products == 10
+    assert sorted(stats.by_marketplace['marketplace']) == ['Paris', 'Ripley']
+    assert recent['name'].tolist() == ['Sobre 10', 'Sobre 9', 'Sobre 8']
+    assert client.requests == 3
@@ -0,0 +1,143 @@
+import jwt
+import pytest
+
+from utils.auth_session import AuthSessionManager
+from utils.fake_supabase import FakeAuth
+
+SECRET = 'test-secret-with-at-least-thirty-two-bytes'
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def auth(clock):
+    return FakeAuth(users={'admin@example.com': 'secret'}, secret=SECRET, expires_in=3600, clock=clock)
+
+def _sign_in(auth):
+    return auth.sign_in_with_password({'email': 'admin@example.com', 'password': 'secret'}).session
+
+def _refresher(auth):
+    return lambda refresh_token: auth.refresh_session(refresh_token).session
+
+def test_valid_session_is_kept_without_refreshing(auth, clock):
+    manager = AuthSessionManager(secret=SECRET, refresh_margin=300, clock=clock)
+    session = _sign_in(auth)
+    
+    assert manager.verify(session.access_token)['sub'] == session.user.id
+    assert manager.ensure_session(session, _refresher(auth)) is session
+    assert auth.refreshes == 0
+
+def test_session_is_refreshed_within_the_margin(auth, clock):
+    manager = AuthSessionManager(secret=SECRET, refresh_margin=300, clock=clock)
+    session = _sign_in(auth)
+    
+    clock.now += 3600 - 200
+    refreshed = manager.ensure_session(session, _refresher(auth))
+    
+    assert refreshed is not session
+    assert auth.refreshes == 1
+    assert manager.verify(refreshed.access_token)['exp'] > clock.now + 3000
+
+def test_expired_session_with_used_refresh_token_is_dropped(auth, clock):
+    manager = AuthSessionManager(secret=SECRET, clock=clock)
+    session = _sign_in(auth)
+    auth.refresh_session(session.refresh_token)
+    
+    clock.now += 7200
+    with pytest.raises(jwt.ExpiredSignatureError):
+        manager.verify(session.access_token)
+    assert manager.ensure_session(session, _refresher(auth)) is None
+
+def test_forged_token_is_rejected_and_never_refreshed(auth, clock):
+    manager = AuthSessionManager(secret=SECRET, clock=clock)
+    forger = FakeAuth(users={'admin@example.com': 'secret'}, secret='another-secret-of-thirty-two-bytes!!', clock=clock)
+    forged = _sign_in(forger)
+    
+    with pytest.raises(jwt.InvalidSignatureError):
+        manager.verify(forged.access_token)
+    assert manager.ensure_session(forged, _refresher(forger)) is None
+    assert forger.refreshes == 0
+
+def test_without_a_secret_only_expiry_is_checked(auth, clock):
+    manager = AuthSessionManager(secret='', clock=clock)
+    session = _sign_in(auth)
+    
+    assert manager.verify(session.access_token)['sub'] == session.user.id
+    clock.now += 7200
+    with pytest.raises(jwt.ExpiredSignatureError):
+        manager.verify(session.access_token)
+
+def test_unreachable_jwks_endpoint_falls_back_to_expiry(clock):
+    from cryptography.hazmat.primitives.asymmetric import ec
+    
+    key = ec.generate_private_key(ec.SECP256R1())
+    token = jwt.encode(
+        {'sub': 'user', 'aud': 'authenticated', 'exp': int(clock.now) + 3600},
+        key, algorithm='ES256', headers={'kid': 'key-1'},
+    )
+    manager = AuthSessionManager(secret='', jwks_url='http://127.0.0.1:9/jwks.json', clock=clock)
+    
+    assert manager.verify(token)['sub'] == 'user'
+
+def _es256_token(key, clock, kid='key-1', expires_in=3600):
+    claims = {'sub': 'user', 'aud': 'authenticated', 'exp': int(clock.now) + expires_in}
+    return jwt.encode(claims, key, algorithm='ES256', headers={'kid': kid})
+
+def test_unreachable_jwks_endpoint_is_not_retried_immediately(clock, monkeypatch):
+    from cryptography.hazmat.primitives.asymmetric import ec
+    
+    fetches = []
+    fetch_data = jwt.PyJWKClient.fetch_data
+    monkeypatch.setattr(jwt.PyJWKClient, 'fetch_data', lambda client: fetches.append(1) or fetch_data(client))
+    key = ec.generate_private_key(ec.SECP256R1())
+    manager = AuthSessionManager(secret='', jwks_url='http://127.0.0.1:9/jwks.json', clock=clock)
+    
+    manager.verify(_es256_token(key, clock))
+    manager.verify(_es256_token(key, clock, expires_in=3601))
+    assert len(fetches) == 1
+    
+    clock.now += 60
+    manager.verify(_es256_token(key, clock))
+    assert len(fetches) == 2
+
+def test_token_with_unknown_kid_is_rejected(clock):
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    
+    from cryptography.hazmat.primitives.asymmetric import ec
+    
+    key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(key.public_key()))
+    body = json.dumps({'keys': [{**jwk, 'kid': 'key-1', 'use': 'sig', 'alg': 'ES256'}]}).encode()
+    
+    class JwksHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), JwksHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        manager = AuthSessionManager(secret='', jwks_url=f'http://127.0.0.1:{server.server_port}/jwks.json', clock=clock)
+        
+        assert manager.verify(_es256_token(key, clock))['sub'] == 'user'
+        unknown = _es256_token(ec.generate_private_key(ec.SECP256R1()), clock, kid='key-2')
+        with pytest.raises(jwt.InvalidTokenError):
+            manager.verify(unknown)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.export import available_formats, build_export, export_key
+
+def _products(rows=5):
+    return pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'name': [f'Producto {number}' for number in range(1, rows + 1)],
+        'price_numeric': pd.array([1000 * number if number % 2 else None for number in range(1, rows + 1)], dtype='Int64'),
+        'in_stock': [number % 3 != 0 for number in range(1, rows + 1)],
+    })
+
+def _read(export, fmt):
+    with export.open() as f:
+        return pd.read_csv(f) if fmt == 'csv' else pd.read_parquet(f)
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_export_round_trips_the_selected_rows_in_order(fmt):
+    if fmt not in available_formats():
+        pytest.skip(f"{fmt} export is not available")
+    frame = _products(7)
+    positions = np.array([6, 0, 3, 4, 1])
+    
+    # Chunks smaller than the result, so the rows are written in several parts
+    export = build_export(export_key(('test', 1), 'round-trip', fmt), frame, positions, fmt=fmt, chunk_rows=2)
+    
+    expected = frame.iloc[positions].reset_index(drop=True)
+    assert export.rows == 5
+    assert export.file_name == f'products.{fmt}'
+    pd.testing.assert_frame_equal(_read(export, fmt), expected, check_dtype=False)
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_empty_export_keeps_the_columns(fmt):
+    if fmt not in available_formats():
+        pytest.skip(f"{fmt} export is not available")
+    frame = _products()
+    
+    export = build_export(export_key(('test', 2), 'empty', fmt), frame, np.array([], dtype=int), fmt=fmt, columns=['id', 'name'])
+    
+    exported = _read(export, fmt)
+    assert list(exported.columns) == ['id', 'name']
+    assert exported.empty
+
+def test_export_is_cached_by_key():
+    frame = _products()
+    key = export_key(('test', 3), 'cached', 'csv')
+    
+    first = build_export(key, frame, fmt='csv')
+    second = build_export(key, frame.iloc[:1], fmt='csv')
+    
+    assert second is first
+    assert first.rows == len(frame)
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from utils.prices import parse_clp_prices
+
+def _baseline_parse_price(price_str):
+    """The per-row parser the Products page used before parse_clp_prices."""
+    if pd.isna(price_str):
+        return 0
+    price_str = str(price_str).replace('$', '').strip()
+    if ',' in price_str:
+        price_str = price_str.split(',')[0]
+    price_str = price_str.replace('.', '')
+    try:
+        return int(price_str)
+    except ValueError:
+        return 0
+
+PRICES = ['$148.900', '$148.900,00', '$12.990', '7490', '$ 1.990', '$0']
+
+@pytest.mark.parametrize('price', PRICES)
+def test_prices_match_the_baseline_parser(price):
+    parsed = parse_clp_prices(pd.Series([price], dtype=object))
+    
+    assert parsed.dtype == 'Int64'
+    assert parsed.iloc[0] == _baseline_parse_price(price)
+
+@pytest.mark.parametrize('price', [None, '', 'Agotado', '$', 'consultar precio'])
+def test_missing_and_unparseable_prices_are_na(price):
+    # The baseline parser returned 0 here, which sorted these rows as free
+    assert _baseline_parse_price(price) == 0
+    assert parse_clp_prices(pd.Series([price], dtype=object)).isna().all()
+
+def test_whole_column_is_parsed_in_place():
+    prices = pd.Series(PRICES + [None, 'Agotado'], index=range(10, 18), dtype=object)
+    
+    parsed = parse_clp_prices(prices)
+    
+    assert parsed.index.equals(prices.index)
+    assert parsed.iloc[:len(PRICES)].tolist() == [_baseline_parse_price(price) for price in PRICES]
+    assert parsed.iloc[len(PRICES):].isna().all()
+
+def test_numeric_prices_are_rounded():
+    assert parse_clp_prices(pd.Series([1990.4, None])).tolist() == [1990, pd.NA]
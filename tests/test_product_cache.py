@@ -0,0 +1,95 @@
+import time
+
+import pandas as pd
+
+from utils.product_cache import ProductCache, ProjectionCache
+
+def _projection_cache(loads):
+    def cache_factory(key):
+        def loader():
+            loads.append(key)
+            columns = sorted(key) if key is not None else ['id', 'name', 'price']
+            return pd.DataFrame({column: [1, 2] for column in columns})
+        return ProductCache(loader)
+    return ProjectionCache(cache_factory, required_columns=('id',))
+
+def test_projection_get_twice_serves_the_loaded_dataset():
+    loads = []
+    cache = _projection_cache(loads)
+    
+    first = cache.get(['name'])
+    second = cache.get(['name'])
+    
+    assert second is first
+    assert loads == [frozenset({'id', 'name'})]
+
+def test_narrow_projection_is_sliced_from_a_wider_one():
+    loads = []
+    cache = _projection_cache(loads)
+    
+    wide = cache.get(['name', 'price'])
+    narrow = cache.get(['name'])
+    
+    assert list(narrow.frame.columns) == ['id', 'name']
+    assert narrow.version == wide.version
+    assert cache.get(['name']) is narrow
+    assert len(loads) == 1
+
+def test_stale_dataset_is_served_while_refreshing():
+    loads = []
+    
+    def loader():
+        loads.append(1)
+        return pd.DataFrame({'id': range(len(loads))})
+    
+    cache = ProductCache(loader)
+    first = cache.get()
+    
+    cache.invalidate()
+    assert cache.get() is first
+    deadline = time.time() + 5
+    while cache._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    
+    assert len(loads) == 2
+    assert cache.get().version > first.version
+    assert len(cache.get().frame) == 2
+
+def test_update_keeps_the_load_time_and_skips_on_store():
+    stored = []
+    cache = ProductCache(lambda: pd.DataFrame({'id': [1]}), on_store=stored.append)
+    first = cache.get()
+    
+    updated = cache.update(lambda: pd.DataFrame({'id': [1, 2]}))
+    
+    assert updated.version > first.version
+    assert updated.loaded_at == first.loaded_at
+    assert stored == [first]
+
+def test_failed_reload_serves_the_last_good_dataset():
+    calls = []
+    
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError('backend down')
+        return pd.DataFrame({'id': [1]})
+    
+    cache = ProductCache(loader)
+    first = cache.get()
+    cache.invalidate(hard=True)
+    
+    assert cache.get() is first
+    assert isinstance(cache.last_error, ConnectionError)
+
+def test_forced_refresh_reloads_a_fresh_dataset():
+    loads = []
+    cache = ProductCache(lambda: loads.append(1) or pd.DataFrame({'id': [len(loads)]}))
+    
+    first = cache.get()
+    assert cache.refresh() is first
+    
+    forced = cache.refresh(force=True)
+    assert forced.version != first.version
+    assert forced.frame['id'].tolist() == [2]
+    assert cache.get() is forced
@@ -0,0 +1,63 @@
+import time
+
+import pandas as pd
+import pytest
+
+from utils import product_filters, search_index
+from utils.product_cache import CachedDataset
+from utils.product_filters import filter_mask, get_marketplaces, get_mask
+
+@pytest.fixture(autouse=True)
+def mask_cache(monkeypatch):
+    monkeypatch.setattr(product_filters, '_mask_cache', {})
+    monkeypatch.setattr(product_filters, '_marketplaces', None)
+    # Versions here are made up, so don't reuse another test's search index
+    monkeypatch.setattr(search_index, '_index', None)
+    monkeypatch.setattr(search_index, '_indexed_version', None)
+    monkeypatch.setattr(search_index, '_indexed_names', None)
+
+def _dataset(version, in_stock=(True, False, None, True)):
+    frame = pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'name': ['Sobre Pokémon', 'Caja Pokemon', 'Sobre Yu-Gi-Oh', 'Mazo Magic'],
+        'marketplace': ['Paris', 'Ripley', 'Paris', None],
+        'in_stock': list(in_stock),
+    })
+    return CachedDataset(frame, version=version, loaded_at=time.time())
+
+def test_masks_are_cached_per_predicate_and_combined():
+    dataset = _dataset(1)
+    
+    paris = get_mask(dataset, 'marketplace', 'Paris')
+    mask = filter_mask(dataset, marketplace='Paris', in_stock=True, search='sobre')
+    
+    assert paris.tolist() == [True, False, True, False]
+    assert mask.tolist() == [True, False, False, False]
+    # Changing one filter reuses the masks of the others
+    assert filter_mask(dataset, marketplace='Paris') is paris
+    assert not paris.flags.writeable
+    assert filter_mask(dataset) is None
+
+def test_search_mask_ignores_case_accents_and_spacing():
+    dataset = _dataset(1)
+    
+    assert filter_mask(dataset, search='POKEMON ').tolist() == [True, True, False, False]
+    assert filter_mask(dataset, search='pokemon') is filter_mask(dataset, search='Pokémon')
+
+def test_new_version_invalidates_masks():
+    old = _dataset(1)
+    new = _dataset(2, in_stock=(False, False, True, True))
+    
+    before = get_mask(old, 'in_stock', True)
+    after = get_mask(new, 'in_stock', True)
+    
+    assert before.tolist() == [True, False, False, True]
+    assert after.tolist() == [False, False, True, True]
+    assert get_mask(old, 'in_stock', True) is before
+
+def test_marketplaces_are_recomputed_for_a_new_version():
+    assert get_marketplaces(_dataset(1)) == ['Paris', 'Ripley']
+    
+    dataset = _dataset(2)
+    dataset.frame.loc[3, 'marketplace'] = 'Falabella'
+    assert get_marketplaces(dataset) == ['Falabella', 'Paris', 'Ripley']
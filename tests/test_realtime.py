@@ -0,0 +1,85 @@
+import pytest
+
+from utils import data_fetcher
+from utils.data_fetcher import (
+    DERIVED_COLUMNS, KEY_COLUMNS, _make_product_cache, get_products_dataset, invalidate_products_cache,
+)
+from utils.fake_supabase import FakeChangeSource, FakeSupabaseClient
+from utils.product_cache import ProjectionCache
+from utils.realtime import RealtimeSubscriber
+from utils.supabase_client import set_supabase_client
+
+def _row(product_id, scraped_at, price='$1.990'):
+    return {
+        'id': product_id,
+        'name': f'Sobre {product_id}',
+        'marketplace': 'Paris',
+        'price': price,
+        'in_stock': True,
+        'scraped_at': f'2026-01-01T00:{scraped_at:02d}:00+00:00',
+    }
+
+@pytest.fixture
+def client(monkeypatch):
+    # A fresh process-wide product cache for every test
+    monkeypatch.setattr(data_fetcher, '_product_syncs', {})
+    monkeypatch.setattr(data_fetcher, '_product_caches', {})
+    monkeypatch.setattr(data_fetcher, '_product_cache', ProjectionCache(
+        _make_product_cache, required_columns=KEY_COLUMNS, derived_columns=DERIVED_COLUMNS
+    ))
+    client = FakeSupabaseClient([_row(product_id, 0) for product_id in range(1, 11)])
+    set_supabase_client(client)
+    yield client
+    set_supabase_client(None)
+
+def _price(product_id):
+    frame = get_products_dataset().frame
+    return frame.loc[frame['id'] == product_id, 'price'].item()
+
+def test_pushed_changes_reach_the_cached_frame(client):
+    source = FakeChangeSource(client)
+    subscriber = RealtimeSubscriber(source, batch_seconds=0)
+    source.start(subscriber.on_event)
+    version = get_products_dataset().version
+    
+    source.insert(_row(11, 1))
+    source.update(_row(3, 1, price='$5.990'))
+    source.delete(4)
+    source.update(_row(3, 2, price='$6.990'))
+    assert subscriber.flush() == 3
+    
+    dataset = get_products_dataset()
+    assert dataset.version > version
+    assert sorted(dataset.frame['id']) == [1, 2, 3, 5, 6, 7, 8, 9, 10, 11]
+    assert _price(3) == '$6.990'
+    assert subscriber.batches_applied == 1
+
+def test_delta_sync_picks_up_a_missed_event(client):
+    source = FakeChangeSource(client)
+    subscriber = RealtimeSubscriber(source, batch_seconds=0)
+    source.start(subscriber.on_event)
+    get_products_dataset()
+    
+    # Written without an event (e.g. during a websocket reconnect) ...
+    client.products = [_row(5, 1, price='$9.990') if row['id'] == 5 else row for row in client.products]
+    # ... followed by a newer change that is delivered
+    source.update(_row(7, 2, price='$7.990'))
+    subscriber.flush()
+    assert _price(7) == '$7.990'
+    assert _price(5) == '$1.990'
+    
+    invalidate_products_cache()
+    data_fetcher._product_caches[None].refresh()
+    assert _price(5) == '$9.990'
+    assert _price(7) == '$7.990'
+
+def test_pushed_changes_are_not_persisted(client):
+    get_products_dataset()
+    cache = data_fetcher._product_caches[None]
+    stored = []
+    cache._on_store = stored.append
+    
+    data_fetcher.apply_product_changes([_row(2, 3, price='$2.990')])
+    
+    assert _price(2) == '$2.990'
+    assert stored == []
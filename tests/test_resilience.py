@@ -0,0 +1,125 @@
+from functools import partial
+
+import httpx
+import pytest
+from postgrest import SyncPostgrestClient
+from postgrest.exceptions import APIError
+
+from utils import data_fetcher
+from utils.resilience import CircuitBreaker, CircuitOpenError, call_with_retry, is_transient
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def _failing(error, calls):
+    def request():
+        calls.append(1)
+        raise error
+    return request
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_seconds=30, clock=clock)
+    
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    
+    clock.now = 30
+    assert breaker.state == 'half-open'
+    breaker.before_request()
+    # Only one trial request at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.times_opened == 1
+
+def test_failed_trial_reopens_the_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    
+    clock.now = 30
+    breaker.before_request()
+    breaker.record_failure()
+    
+    assert breaker.state == 'open'
+    clock.now = 59
+    assert breaker.state == 'open'
+
+def test_transient_failures_are_retried():
+    breaker = CircuitBreaker('test', failure_threshold=10)
+    attempts = []
+    
+    def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise httpx.ConnectError('connection refused')
+        return 'response'
+    
+    assert call_with_retry(request, 'test.transient', retries=3, breaker=breaker, sleep=lambda _: None) == 'response'
+    assert len(attempts) == 3
+    assert breaker.failures == 0
+
+def test_request_errors_are_not_retried_and_keep_the_breaker_closed():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    calls = []
+    request = _failing(APIError({'code': '42703', 'message': 'column products.nme does not exist'}), calls)
+    
+    for _ in range(5):
+        with pytest.raises(APIError):
+            call_with_retry(request, 'test.bad', retries=3, breaker=breaker, sleep=lambda _: None)
+    
+    assert len(calls) == 5
+    assert breaker.state == 'closed'
+
+def test_exhausted_retries_open_the_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=3)
+    calls = []
+    
+    with pytest.raises(httpx.ReadTimeout):
+        call_with_retry(_failing(httpx.ReadTimeout('timed out'), calls), 'test.down', retries=2,
+                        breaker=breaker, sleep=lambda _: None)
+    
+    assert len(calls) == 3
+    assert breaker.state == 'open'
+
+def test_postgrest_does_not_retry_on_top_of_the_backoff(monkeypatch):
+    requests = []
+    
+    def unavailable(request):
+        requests.append(request)
+        return httpx.Response(503, json={'message': 'Service Unavailable'})
+    
+    client = SyncPostgrestClient('http://supabase.test/rest/v1', http_client=httpx.Client(transport=httpx.MockTransport(unavailable)))
+    breaker = CircuitBreaker('test', failure_threshold=10)
+    monkeypatch.setattr(data_fetcher, 'call_with_retry', partial(call_with_retry, retries=2, breaker=breaker, sleep=lambda _: None))
+    
+    with pytest.raises(APIError):
+        data_fetcher._execute(client.from_('products').select('id').limit(1), 'test.unavailable')
+    
+    # One request per attempt: postgrest would otherwise retry each 503 three times
+    assert len(requests) == 3
+    assert breaker.failures == 3
+
+@pytest.mark.parametrize('error, transient', [
+    (httpx.ConnectTimeout('timed out'), True),
+    (APIError({'code': 502, 'message': 'JSON could not be generated'}), True),
+    (APIError({'code': 429, 'message': 'JSON could not be generated'}), True),
+    (APIError({'code': 'PGRST003', 'message': 'Timed out acquiring connection'}), True),
+    (APIError({'code': '57014', 'message': 'canceling statement due to statement timeout'}), True),
+    (APIError({'code': 'PGRST103', 'message': 'Requested range not satisfiable'}), False),
+    (APIError({'code': '42P01', 'message': 'relation "marketplace_stats" does not exist'}), False),
+    (ValueError('bad input'), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
@@ -0,0 +1,20 @@
+import pandas as pd
+
+from utils.search_index import build_index, tokenize_series
+
+def test_tokens_are_folded_to_lowercase_ascii():
+    tokens = tokenize_series(pd.Series(['Álbum Pokémon Escarlata', None]))
+    
+    assert tokens.tolist() == [['album', 'pokemon', 'escarlata'], []]
+
+def test_search_matches_word_prefixes_ignoring_accents():
+    frame = pd.DataFrame({
+        'id': [1, 2, 3],
+        'name': ['Sobre Mundial 2026', 'Álbum Copa América', 'Sobre Patrulla de Guerra'],
+    })
+    index = build_index(frame)
+    
+    assert index.search('sobre') == {1, 3}
+    assert index.search('album america') == {2}
+    assert index.search('patr guer') == {3}
+    assert index.search('copa mundial') == set()
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from utils.aggregations import compute_marketplace_stats
+from utils.data_fetcher import prepare_products
+from utils.fake_supabase import FakeSupabaseClient
+from utils.server_aggregates import fetch_marketplace_stats
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Mesa', 'marketplace': 'falabella', 'price': '$148.900', 'in_stock': True},
+    {'id': 2, 'name': 'Silla', 'marketplace': 'falabella', 'price': '$12.990', 'in_stock': False},
+    {'id': 3, 'name': 'Lámpara', 'marketplace': 'paris', 'price': '7490', 'in_stock': True},
+    {'id': 4, 'name': 'Sofá', 'marketplace': 'ripley', 'price': None, 'in_stock': True},
+    {'id': 5, 'name': 'Cama', 'marketplace': None, 'price': '$99.990', 'in_stock': True},
+    {'id': 6, 'name': 'Repisa', 'marketplace': None, 'price': 'consultar', 'in_stock': False},
+]
+
+def test_server_stats_match_the_local_aggregation():
+    local = compute_marketplace_stats(prepare_products(pd.DataFrame(PRODUCTS)), bins=4)
+    server = fetch_marketplace_stats(bins=4, client=FakeSupabaseClient(PRODUCTS))
+    
+    # Products without a marketplace count toward the total, not the table
+    assert server.total_products == local.total_products == len(PRODUCTS)
+    assert server.total_marketplaces == local.total_marketplaces == 3
+    assert server.total_in_stock == local.total_in_stock == 3
+    
+    pd.testing.assert_frame_equal(
+        server.by_marketplace.sort_values('marketplace', ignore_index=True),
+        local.by_marketplace.sort_values('marketplace', ignore_index=True).astype({'marketplace': object}),
+        check_dtype=False,
+    )
+    pd.testing.assert_frame_equal(server.price_histogram, local.price_histogram, check_dtype=False)
+    assert server.price_histogram['count'].sum() == 4
+
+def test_empty_products_table_gives_zeroed_server_stats():
+    stats = fetch_marketplace_stats(client=FakeSupabaseClient([]))
+    
+    assert stats.total_products == 0
+    assert stats.by_marketplace.empty
+    assert stats.price_histogram.empty
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight, coalesced
+
+def test_concurrent_calls_share_one_load():
+    flight = SingleFlight('test.shared')
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+    
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return object()
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', load)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', load))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()['coalesced'] < 5:
+        if time.monotonic() > deadline:
+            release.set()
+            pytest.fail(f"callers were not coalesced: {flight.stats()}")
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    
+    assert len(loads) == 1
+    assert len(results) == 6 and all(result is results[0] for result in results)
+    assert flight.stats() == {'calls': 1, 'coalesced': 5, 'timeouts': 0, 'errors': 0, 'in_flight': 0}
+
+def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight('test.errors')
+    
+    with pytest.raises(RuntimeError):
+        flight.do('key', lambda: (_ for _ in ()).throw(RuntimeError('backend down')))
+    assert flight.do('key', lambda: 'recovered') == 'recovered'
+    assert flight.stats()['errors'] == 1
+
+def test_coalesced_keys_on_arguments():
+    flight = SingleFlight('test.decorator')
+    
+    @coalesced(flight)
+    def query(marketplace, search_words=()):
+        return (marketplace, search_words)
+    
+    assert query('Paris', search_words=['sobre']) == ('Paris', ['sobre'])
+    assert flight.stats()['calls'] == 1
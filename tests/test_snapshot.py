@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from utils import snapshot
+from utils.data_fetcher import prepare_products
+from utils.snapshot import load_snapshot, save_snapshot
+
+COLUMNS = ['id', 'marketplace', 'name', 'price', 'in_stock', 'scraped_at']
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'SNAPSHOTS_ENABLED', True)
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+def _products():
+    return prepare_products(pd.DataFrame({
+        'id': [1, 2, 3],
+        'marketplace': ['Paris', 'Ripley', None],
+        'name': ['Sobre', 'Caja', 'Mazo'],
+        'price': ['$1.990', None, '$12.990,00'],
+        'in_stock': [True, False, None],
+        'scraped_at': ['2026-01-01T00:00:00+00:00', '2026-01-02T00:00:00+00:00', None],
+    }))
+
+def test_snapshot_round_trips_frame_and_metadata():
+    frame = _products()
+    
+    assert save_snapshot(frame, COLUMNS, 7, '2026-01-02T00:00:00+00:00', 123.0)
+    restored = load_snapshot(COLUMNS)
+    
+    pd.testing.assert_frame_equal(restored.frame, frame)
+    assert restored.version == 7
+    assert restored.watermark == '2026-01-02T00:00:00+00:00'
+    assert restored.last_full_sync == 123.0
+    assert load_snapshot(None) is None
+
+def test_corrupt_snapshot_is_ignored(snapshot_dir):
+    save_snapshot(_products(), COLUMNS, 7, None, 0.0)
+    path, = snapshot_dir.glob('*.feather')
+    path.write_bytes(path.read_bytes()[:100])
+    
+    assert load_snapshot(COLUMNS) is None
+
+def test_snapshot_of_another_format_is_ignored(monkeypatch):
+    save_snapshot(_products(), COLUMNS, 7, None, 0.0)
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_FORMAT', snapshot.SNAPSHOT_FORMAT + 1)
+    
+    assert load_snapshot(COLUMNS) is None
+
+def test_interrupted_write_keeps_the_previous_snapshot(snapshot_dir):
+    save_snapshot(_products(), COLUMNS, 7, 'first', 0.0)
+    path, = snapshot_dir.glob('*.feather')
+    # A crash before the rename leaves only a partial temporary file behind
+    (snapshot_dir / (path.name + '.tmp')).write_bytes(b'partial')
+    
+    restored = load_snapshot(COLUMNS)
+    assert (restored.version, restored.watermark) == (7, 'first')
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import table_paging
+from utils.product_cache import CachedDataset
+from utils.table_paging import get_sort_order, page_count, page_rows, sort_order, sorted_positions
+
+@pytest.fixture(autouse=True)
+def order_cache(monkeypatch):
+    monkeypatch.setattr(table_paging, '_order_cache', {})
+
+def _products(rows=10):
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'name': [f'Producto {number:02d}' for number in range(rows)],
+        'price_numeric': pd.array([(rows - number) * 100 if number % 4 else None for number in range(rows)], dtype='Int64'),
+    })
+
+def test_missing_values_sort_last_in_both_directions():
+    prices = _products()['price_numeric']
+    
+    ascending = sort_order(prices)
+    descending = sort_order(prices, descending=True)
+    
+    assert ascending.tolist() == [9, 7, 6, 5, 3, 2, 1, 0, 4, 8]
+    assert descending.tolist() == [1, 2, 3, 5, 6, 7, 9, 0, 4, 8]
+
+def test_pages_cover_every_row_once_at_the_boundaries():
+    frame = _products(10)
+    positions = sort_order(frame['name'], descending=True)
+    
+    pages = [page_rows(frame, positions, page, 4) for page in range(1, page_count(10, 4) + 1)]
+    
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert pd.concat(pages)['id'].tolist() == list(range(9, -1, -1))
+    assert page_rows(frame, positions, 4, 4).empty
+
+@pytest.mark.parametrize('total, expected', [(0, 1), (1, 1), (50, 1), (51, 2), (100, 2)])
+def test_page_count(total, expected):
+    assert page_count(total, 50) == expected
+
+def test_filtered_positions_keep_the_sort_order():
+    frame = _products(10)
+    order = sort_order(frame['name'], descending=True)
+    mask = (frame['id'] % 3 == 0).to_numpy()
+    
+    positions = sorted_positions(order, mask)
+    
+    assert positions.tolist() == [9, 6, 3, 0]
+    assert page_rows(frame, positions, 2, 3, columns=['name'])['name'].tolist() == ['Producto 00']
+    assert sorted_positions(order, np.zeros(10, dtype=bool)).size == 0
+    assert sorted_positions(order) is order
+
+def test_sort_order_is_cached_per_version_and_read_only():
+    frame = _products()
+    
+    order = get_sort_order(CachedDataset(frame, version=1, loaded_at=time.time()), 'name')
+    assert get_sort_order(CachedDataset(frame, version=1, loaded_at=time.time()), 'name') is order
+    assert get_sort_order(CachedDataset(frame, version=2, loaded_at=time.time()), 'name') is not order
+    assert not order.flags.writeable
@@ -0,0 +1,160 @@
+"""
+Marketplace aggregations for the Analytics page, memoized per dataset version.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+HISTOGRAM_BINS = 30
+
+@dataclass(frozen=True)
+class MarketplaceStats:
+    """
+    Precomputed product statistics.
+    
+    Attributes:
+        by_marketplace: One row per marketplace with products, in_stock,
+            out_of_stock, priced (products with a parsed price), avg_price,
+            min_price and max_price columns
+        price_histogram: One row per price bin with bin_start, bin_end and count
+        total_products: Number of products
+    """
+    by_marketplace: pd.DataFrame
+    price_histogram: pd.DataFrame
+    total_products: int
+    
+    @property
+    def total_marketplaces(self) -> int:
+        return len(self.by_marketplace)
+    
+    @property
+    def total_in_stock(self) -> int:
+        return int(self.by_marketplace['in_stock'].sum())
+    
+    @property
+    def total_out_of_stock(self) -> int:
+        return int(self.by_marketplace['out_of_stock'].sum())
+    
+    @property
+    def min_price(self) -> float:
+        """Lowest parsed price (NaN if none)."""
+        return float(self.by_marketplace['min_price'].min())
+    
+    @property
+    def max_price(self) -> float:
+        """Highest parsed price (NaN if none)."""
+        return float(self.by_marketplace['max_price'].max())
+    
+    @property
+    def avg_price(self) -> float:
+        """Mean parsed price over all products (NaN if none)."""
+        priced = self.by_marketplace['priced']
+        if priced.sum() == 0:
+            return float('nan')
+        return float((self.by_marketplace['avg_price'].fillna(0) * priced).sum() / priced.sum())
+
+def price_histogram(prices, bins=HISTOGRAM_BINS):
+    """
+    Bin prices into equal-width buckets.
+    
+    Args:
+        prices: pandas.Series of numeric prices (missing values are ignored)
+        bins: Number of buckets
+    
+    Returns:
+        pandas.DataFrame: bin_start, bin_end and count per bucket
+    """
+    values = pd.to_numeric(prices, errors='coerce').dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame({'bin_start': [], 'bin_end': [], 'count': []})
+    
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({'bin_start': edges[:-1], 'bin_end': edges[1:], 'count': counts})
+
+def compute_marketplace_stats(frame, bins=HISTOGRAM_BINS):
+    """
+    Compute every per-marketplace statistic in a single groupby pass.
+    
+    Args:
+        frame: Product DataFrame, normally with 'marketplace', 'in_stock'
+            and 'price_numeric' columns. Missing columns (e.g. in the
+            column-less frame of an empty table) count as unknown values.
+        bins: Number of price histogram buckets
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    if 'marketplace' in frame.columns:
+        marketplaces = frame['marketplace']
+    else:
+        marketplaces = pd.Series(None, index=frame.index, dtype=object)
+    
+    if 'in_stock' in frame.columns:
+        in_stock = frame['in_stock'].eq(True).fillna(False).astype(bool)
+        out_of_stock = frame['in_stock'].eq(False).fillna(False).astype(bool)
+    else:
+        in_stock = out_of_stock = pd.Series(False, index=frame.index)
+    
+    if 'price_numeric' in frame.columns:
+        prices = pd.to_numeric(frame['price_numeric'], errors='coerce').astype(float)
+    else:
+        prices = pd.Series(np.nan, index=frame.index)
+    
+    working = pd.DataFrame({
+        'marketplace': marketplaces,
+        'in_stock': in_stock,
+        'out_of_stock': out_of_stock,
+        'price': prices,
+    })
+    
+    by_marketplace = working.groupby('marketplace', observed=True).agg(
+        products=('in_stock', 'size'),
+        in_stock=('in_stock', 'sum'),
+        out_of_stock=('out_of_stock', 'sum'),
+        priced=('price', 'count'),
+        avg_price=('price', 'mean'),
+        min_price=('price', 'min'),
+        max_price=('price', 'max'),
+    ).reset_index()
+    by_marketplace['marketplace'] = by_marketplace['marketplace'].astype(str)
+    by_marketplace = by_marketplace.sort_values('products', ascending=False, ignore_index=True)
+    
+    return MarketplaceStats(
+        by_marketplace=by_marketplace,
+        price_histogram=price_histogram(prices, bins=bins),
+        total_products=len(frame),
+    )
+
+# Stats per (dataset version, bins), oldest evicted first
+_STATS_CACHE_SIZE = 8
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+def get_marketplace_stats(dataset, bins=HISTOGRAM_BINS):
+    """
+    Get marketplace statistics for a cached dataset, computing them at most
+    once per dataset version.
+    
+    Args:
+        dataset: CachedDataset from utils.data_fetcher
+        bins: Number of price histogram buckets
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    key = (dataset.version, bins)
+    
+    with _stats_lock:
+        stats = _stats_cache.get(key)
+    if stats is not None:
+        return stats
+    
+    stats = compute_marketplace_stats(dataset.frame, bins=bins)
+    
+    with _stats_lock:
+        _stats_cache[key] = stats
+        while len(_stats_cache) > _STATS_CACHE_SIZE:
+            del _stats_cache[next(iter(_stats_cache))]
+    return stats
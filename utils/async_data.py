@@ -0,0 +1,129 @@
+"""
+Async data access over a pooled, keep-alive HTTP connection.
+
+Queries run on one background event loop shared by every session, through
+an async PostgREST client whose httpx connection pool is reused across
+requests, so independent queries (products, aggregates, counts) can be
+issued together and a page waits roughly as long as its slowest query.
+The synchronous Streamlit script calls run_async() or gather() to use them.
+"""
+import asyncio
+import threading
+
+import httpx
+import pandas as pd
+from postgrest import AsyncPostgrestClient
+
+from utils.supabase_client import POOL_SIZE, REQUEST_TIMEOUT_SECONDS, get_async_client_override, get_supabase_credentials
+from utils.data_fetcher import prepare_products, select_clause
+from utils.resilience import call_with_retry_async
+
+_loop = None
+_loop_lock = threading.Lock()
+_async_client = None
+
+def _get_loop():
+    """
+    Get the background event loop, starting its thread on first use.
+    """
+    global _loop
+    
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='supabase-async', daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+    
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait, or None to wait indefinitely
+    
+    Returns:
+        The coroutine's result (its exception is re-raised)
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+def gather(*coros, timeout=None):
+    """
+    Run several coroutines concurrently and wait for all of them.
+    
+    Args:
+        *coros: Coroutines to run
+        timeout: Seconds to wait for all of them, or None
+    
+    Returns:
+        list: Results, in the order the coroutines were given
+    """
+    async def _gather():
+        return await asyncio.gather(*coros)
+    return run_async(_gather(), timeout=timeout)
+
+def get_async_client(pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT_SECONDS) -> AsyncPostgrestClient:
+    """
+    Get or create the async PostgREST client singleton. Only use it from
+    coroutines running on the shared loop (see run_async), since its
+    connection pool is bound to that loop.
+    
+    Args:
+        pool_size: Maximum open (and kept-alive) connections
+        timeout: Seconds before a request times out
+    
+    Returns:
+        AsyncPostgrestClient: Client for the project's REST API, or the
+            replacement set with utils.supabase_client.set_supabase_client
+    """
+    global _async_client
+    
+    replacement = get_async_client_override()
+    if replacement is not None:
+        return replacement
+    
+    if _async_client is None:
+        supabase_url, supabase_key = get_supabase_credentials()
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(timeout),
+            follow_redirects=True,
+        )
+        _async_client = AsyncPostgrestClient(
+            f"{supabase_url.rstrip('/')}/rest/v1",
+            headers={
+                'apikey': supabase_key,
+                'Authorization': f"Bearer {supabase_key}",
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+            },
+            http_client=http_client,
+        )
+    return _async_client
+
+async def _execute(query, operation):
+    """
+    Execute an async query, retrying failures with backoff (see utils.resilience)
+    instead of postgrest's own retries, as utils.data_fetcher does.
+    """
+    return await call_with_retry_async(query.retry(False).execute, operation)
+
+async def fetch_recent_products_async(limit=10, columns=None):
+    """
+    Fetch the most recently scraped products.
+    
+    Args:
+        limit: Number of products
+        columns: Columns to select, or None for all columns
+    
+    Returns:
+        pandas.DataFrame: Products, newest first
+    """
+    query = get_async_client().from_('products')\
+        .select(select_clause(columns))\
+        .order('scraped_at', desc=True)\
+        .limit(limit)
+    response = await _execute(query, 'supabase.recent')
+    return prepare_products(pd.DataFrame(response.data or []))
@@ -1,19 +1,81 @@
 """
 Authentication utilities for Streamlit app using Supabase Auth.
 """
+import uuid
+
 import streamlit as st
-from utils.supabase_client import get_supabase_client
+from utils.auth_session import get_session_manager
+from utils.supabase_client import drop_session_client, get_session_client, get_supabase_client
+
+# Seconds between refresh attempts while a failing refresh leaves a still valid token
+REFRESH_RETRY_SECONDS = 30
+
+def _remember_session(session, user=None):
+    """
+    Store a verified session and the time until which it can be used
+    without checking it again.
+    """
+    manager = get_session_manager()
+    claims = manager.verify(session.access_token)
+    
+    st.session_state.session = session
+    st.session_state.user = user or getattr(session, 'user', None) or st.session_state.get('user')
+    st.session_state.auth_valid_until = max(
+        manager.valid_until(claims),
+        min(claims['exp'], manager.clock() + REFRESH_RETRY_SECONDS)
+    )
+
+def _clear_session():
+    for key in ('user', 'session', 'auth_valid_until'):
+        if key in st.session_state:
+            del st.session_state[key]
+
+def _session_key():
+    if 'client_key' not in st.session_state:
+        st.session_state.client_key = uuid.uuid4().hex
+    return st.session_state.client_key
+
+def get_user_client():
+    """
+    Get this browser session's Supabase client. Sign-in, token refresh and
+    anything acting as the signed-in user go through it, never through the
+    shared client, so concurrent users can't overwrite each other's auth.
+    
+    Returns:
+        Supabase client for the current session
+    """
+    session = st.session_state.get('session')
+    return get_session_client(_session_key(), access_token=getattr(session, 'access_token', None))
+
+def _refresh_session(refresh_token):
+    return get_user_client().auth.refresh_session(refresh_token).session
 
 def check_authentication():
     """
     Check if user is authenticated. If not, show login form.
     
+    The access token is verified locally (signature and expiry) and the
+    result is kept in the session, so until the token is due for a refresh
+    this is a single comparison. Tokens close to expiry are refreshed;
+    expired or invalid sessions are signed out.
+    
     Returns:
         bool: True if authenticated, False otherwise
     """
-    if 'user' in st.session_state and st.session_state.user is not None:
+    if st.session_state.get('user') is None:
+        return False
+    if get_session_manager().clock() < st.session_state.get('auth_valid_until', 0):
         return True
-    return False
+    
+    session = st.session_state.get('session')
+    if session is not None:
+        session = get_session_manager().ensure_session(session, _refresh_session)
+    if session is None:
+        _clear_session()
+        return False
+    
+    _remember_session(session)
+    return True
 
 def login_form():
     """
@@ -33,20 +95,19 @@ def login_form():
                 return
             
             try:
-                supabase = get_supabase_client()
+                supabase = get_user_client()
                 auth_response = supabase.auth.sign_in_with_password({
                     "email": email,
                     "password": password
                 })
                 
                 if auth_response.user:
-                    st.session_state.user = auth_response.user
-                    st.session_state.session = auth_response.session
+                    _remember_session(auth_response.session, auth_response.user)
                     st.success("Login successful!")
                     st.rerun()
                 else:
                     st.error("Login failed. Please check your credentials.")
-                    
+            
             except Exception as e:
                 st.error(f"Login error: {str(e)}")
     
@@ -71,16 +132,14 @@ def logout():
     Logout current user and clear session.
     """
     try:
-        supabase = get_supabase_client()
+        supabase = get_user_client()
         supabase.auth.sign_out()
     except:
         pass
+    drop_session_client(_session_key())
     
     # Clear session state
-    if 'user' in st.session_state:
-        del st.session_state.user
-    if 'session' in st.session_state:
-        del st.session_state.session
+    _clear_session()
     
     st.rerun()
 
@@ -100,7 +159,7 @@ def send_password_reset(email):
     
     Args:
         email: User's email address
-        
+    
     Returns:
         bool: True if email sent successfully, False otherwise
     """
@@ -0,0 +1,216 @@
+"""
+Local verification and proactive refresh of Supabase access tokens.
+
+Supabase access tokens are JWTs signed with the project's JWT secret
+(HS256) or, on projects using asymmetric signing keys, with a key published
+at /auth/v1/.well-known/jwks.json. Verifying them locally turns the
+authentication check every page does on every rerun into a signature and
+expiry check; the auth server is only contacted to refresh a token shortly
+before it expires.
+
+When no key is available (HS256 tokens without SUPABASE_JWT_SECRET, or an
+unreachable JWKS endpoint), only the expiry of the token is checked, as
+before local verification was added: tokens only ever come from the auth
+server's own responses, kept in server-side session state. A token whose
+key id is not in a JWKS that could be fetched is rejected.
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import jwt
+
+JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+REFRESH_MARGIN_SECONDS = int(os.getenv("AUTH_REFRESH_MARGIN_SECONDS", "300"))
+
+# Clock skew tolerated when checking expiry
+LEEWAY_SECONDS = 10
+# Algorithms accepted from the JWKS endpoint
+ASYMMETRIC_ALGORITHMS = ['RS256', 'ES256']
+# Seconds to wait for the JWKS endpoint, and before trying it again after a failure
+JWKS_TIMEOUT_SECONDS = 5
+JWKS_RETRY_SECONDS = 30
+
+class AuthSessionManager:
+    """
+    Verifies access tokens and refreshes sessions before they expire.
+    
+    Signature and claim checks run once per token (the result is cached);
+    expiry is checked against the clock on every call.
+    """
+    
+    # Verified tokens kept, oldest evicted first
+    CACHE_SIZE = 1024
+    
+    def __init__(self, secret: str = JWT_SECRET, jwks_url: Optional[str] = None,
+                 audience: Optional[str] = JWT_AUDIENCE, refresh_margin: float = REFRESH_MARGIN_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            secret: JWT secret for HS256 tokens; when empty, HS256 tokens
+                are only checked for expiry
+            jwks_url: JWKS endpoint (defaults to the project's, from SUPABASE_URL)
+            audience: Expected 'aud' claim (None to skip the check)
+            refresh_margin: Seconds before expiry at which a session is refreshed
+            clock: Time source, replaceable for testing
+        """
+        self.secret = secret
+        self.audience = audience
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self._jwks_url = jwks_url
+        self._jwks_client = None
+        self._jwks_unreachable_until = 0.0
+        self._verified = {}
+        self._lock = threading.Lock()
+    
+    def _signing_key(self, token):
+        """
+        Get the key and algorithms to verify a token with, or None if no key
+        is available for it.
+        
+        Raises:
+            jwt.InvalidTokenError: If the JWKS has no key for the token's kid
+        """
+        algorithm = jwt.get_unverified_header(token).get('alg')
+        if algorithm == 'HS256':
+            return (self.secret, ['HS256']) if self.secret else None
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unexpected token algorithm: {algorithm}")
+        
+        url = self._jwks_url
+        if url is None:
+            supabase_url = os.getenv("SUPABASE_URL")
+            if not supabase_url:
+                return None
+            url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        if self.clock() < self._jwks_unreachable_until:
+            return None
+        if self._jwks_client is None:
+            # Keys are fetched once and cached by the client
+            self._jwks_client = jwt.PyJWKClient(url, cache_keys=True, timeout=JWKS_TIMEOUT_SECONDS)
+        try:
+            return self._jwks_client.get_signing_key_from_jwt(token).key, ASYMMETRIC_ALGORITHMS
+        except jwt.PyJWKClientConnectionError as e:
+            print(f"JWKS endpoint unreachable, checking access token expiry only: {e}")
+            self._jwks_unreachable_until = self.clock() + JWKS_RETRY_SECONDS
+            return None
+        except jwt.PyJWKClientError as e:
+            # The keys were fetched but none matches: never skip the signature check
+            raise jwt.InvalidTokenError(f"No signing key for access token: {e}") from e
+    
+    def verify(self, token) -> dict:
+        """
+        Verify an access token. Without a key for it (see the module
+        docstring), only its expiry is checked.
+        
+        Args:
+            token: Access token (JWT)
+        
+        Returns:
+            dict: The token's claims
+        
+        Raises:
+            jwt.ExpiredSignatureError: If the token has expired
+            jwt.InvalidTokenError: If the token is malformed, forged or for
+                another audience
+        """
+        with self._lock:
+            claims = self._verified.get(token)
+        
+        if claims is None:
+            signing_key = self._signing_key(token)
+            # Expiry is checked below against self.clock, for cached tokens too
+            options = {
+                'require': ['exp', 'sub'],
+                'verify_exp': False,
+                'verify_aud': self.audience is not None,
+            }
+            if signing_key is None:
+                # Not cached, so the signature is checked once a key is available
+                return self._check_expiry(jwt.decode(
+                    token,
+                    options={**options, 'verify_signature': False, 'verify_aud': False},
+                ))
+            
+            key, algorithms = signing_key
+            claims = jwt.decode(token, key, algorithms=algorithms, audience=self.audience, options=options)
+            with self._lock:
+                self._verified[token] = claims
+                while len(self._verified) > self.CACHE_SIZE:
+                    del self._verified[next(iter(self._verified))]
+        
+        return self._check_expiry(claims)
+    
+    def _check_expiry(self, claims) -> dict:
+        if claims['exp'] + LEEWAY_SECONDS < self.clock():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return claims
+    
+    def valid_until(self, claims) -> float:
+        """
+        Time until which a token with these claims can be used without a refresh.
+        """
+        return claims['exp'] - self.refresh_margin
+    
+    def ensure_session(self, session, refresh):
+        """
+        Check a session, refreshing it if its token expires within the
+        refresh margin (or already has).
+        
+        Args:
+            session: Session with access_token and refresh_token
+            refresh: Callable taking a refresh token and returning a new session
+        
+        Returns:
+            Session or None: The session to keep using (the same one, or the
+                refreshed one), or None if it is no longer valid
+        """
+        try:
+            claims = self.verify(session.access_token)
+        except jwt.ExpiredSignatureError:
+            claims = None
+        except jwt.PyJWTError as e:
+            # Forged or garbled: never trade it for a new token
+            print(f"Rejected access token: {e}")
+            return None
+        
+        if claims is not None and self.clock() < self.valid_until(claims):
+            return session
+        
+        try:
+            refreshed = refresh(session.refresh_token)
+            if refreshed is None:
+                raise ValueError("no session returned")
+            self.verify(refreshed.access_token)
+        except Exception as e:
+            print(f"Error refreshing session: {e}")
+            # Keep a still valid token until it actually expires
+            return session if claims is not None else None
+        return refreshed
+
+_session_manager: Optional[AuthSessionManager] = None
+
+def get_session_manager() -> AuthSessionManager:
+    """
+    Get or create the shared session manager.
+    """
+    global _session_manager
+    
+    if _session_manager is None:
+        _session_manager = AuthSessionManager()
+    return _session_manager
+
+def set_session_manager(manager: Optional[AuthSessionManager]) -> None:
+    """
+    Replace the shared session manager, e.g. with one using a test secret
+    and clock.
+    
+    Args:
+        manager: Manager to return from get_session_manager (None to
+            recreate the default one on next use)
+    """
+    global _session_manager
+    _session_manager = manager
@@ -0,0 +1,148 @@
+"""
+Plotly figures for the Overview and Analytics pages, cached per statistics.
+
+Every chart is built from a MarketplaceStats (already aggregated, with the
+price histogram pre-binned), so figures only carry one point per
+marketplace or bin, never one per product. Built figures are cached by
+chart id, the stats they were built from and the chart parameters: stats
+are themselves cached per dataset version (or server fetch), so reruns
+reuse the same figure until the data changes.
+"""
+import threading
+
+import pandas as pd
+import plotly.express as px
+
+from utils.perf import stage
+
+STOCK_COLORS = {'In Stock': '#00D26A', 'Out of Stock': '#FF4B4B'}
+
+def _marketplace_distribution(stats):
+    marketplace_counts = stats.by_marketplace[['marketplace', 'products']]
+    marketplace_counts.columns = ['Marketplace', 'Count']
+    fig = px.bar(
+        marketplace_counts,
+        x='Marketplace',
+        y='Count',
+        color='Marketplace',
+        title="Product Distribution"
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+def _stock_distribution(stats):
+    stock_counts = pd.DataFrame({
+        'Status': ['In Stock', 'Out of Stock'],
+        'Count': [stats.total_in_stock, stats.total_out_of_stock]
+    })
+    return px.pie(
+        stock_counts,
+        values='Count',
+        names='Status',
+        title="Stock Distribution",
+        color='Status',
+        color_discrete_map=STOCK_COLORS
+    )
+
+def _products_per_marketplace(stats):
+    marketplace_counts = stats.by_marketplace[['marketplace', 'products']]
+    marketplace_counts.columns = ['Marketplace', 'Products']
+    fig = px.bar(
+        marketplace_counts,
+        x='Marketplace',
+        y='Products',
+        title="Products per Marketplace",
+        color='Products',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+def _stock_by_marketplace(stats):
+    stock_by_marketplace = stats.by_marketplace.melt(
+        id_vars='marketplace',
+        value_vars=['in_stock', 'out_of_stock'],
+        var_name='in_stock',
+        value_name='count'
+    )
+    stock_by_marketplace['in_stock'] = stock_by_marketplace['in_stock'].map({'in_stock': 'In Stock', 'out_of_stock': 'Out of Stock'})
+    return px.bar(
+        stock_by_marketplace,
+        x='marketplace',
+        y='count',
+        color='in_stock',
+        title="Stock Status by Marketplace",
+        barmode='group',
+        color_discrete_map=STOCK_COLORS
+    )
+
+def _price_distribution(stats):
+    # One bar per pre-computed bin; the raw prices never reach the figure
+    histogram = stats.price_histogram
+    fig = px.bar(
+        x=(histogram['bin_start'] + histogram['bin_end']) / 2,
+        y=histogram['count'],
+        title="Price Distribution",
+        labels={'x': 'Price (CLP)', 'y': 'count'}
+    )
+    fig.update_traces(width=(histogram['bin_end'] - histogram['bin_start']).tolist())
+    return fig
+
+def _average_price(stats):
+    avg_price_by_marketplace = stats.by_marketplace[['marketplace', 'avg_price']]
+    avg_price_by_marketplace.columns = ['Marketplace', 'Average Price']
+    return px.bar(
+        avg_price_by_marketplace,
+        x='Marketplace',
+        y='Average Price',
+        title="Average Price by Marketplace",
+        color='Average Price',
+        color_continuous_scale='Blues'
+    )
+
+# Chart id -> builder taking a MarketplaceStats
+CHARTS = {
+    'overview.marketplaces': _marketplace_distribution,
+    'overview.stock': _stock_distribution,
+    'analytics.marketplaces': _products_per_marketplace,
+    'analytics.stock': _stock_by_marketplace,
+    'analytics.price_distribution': _price_distribution,
+    'analytics.average_price': _average_price,
+}
+
+# Built figures by (chart id, stats identity, params), oldest evicted first.
+# Entries keep their stats alive, so the identity can't be reused while cached.
+_FIGURE_CACHE_SIZE = 64
+_figures = {}
+_figures_lock = threading.Lock()
+
+def get_figure(chart_id, stats, **params):
+    """
+    Get a chart's figure, building it at most once per stats object and
+    parameter set.
+    
+    The returned figure is shared between sessions and must not be modified.
+    
+    Args:
+        chart_id: Key of CHARTS
+        stats: MarketplaceStats the chart is built from
+        **params: Extra builder arguments (part of the cache key)
+    
+    Returns:
+        plotly.graph_objects.Figure: The figure
+    """
+    key = (chart_id, id(stats), tuple(sorted(params.items())))
+    
+    with _figures_lock:
+        cached = _figures.get(key)
+    if cached is not None:
+        return cached[1]
+    
+    with stage('figure.build'):
+        fig = CHARTS[chart_id](stats, **params)
+    
+    with _figures_lock:
+        _figures[key] = (stats, fig)
+        while len(_figures) > _FIGURE_CACHE_SIZE:
+            del _figures[next(iter(_figures))]
+    return fig
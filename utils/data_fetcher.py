@@ -1,38 +1,714 @@
 """
 Data fetching utilities for Streamlit app.
 """
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from utils.supabase_client import get_supabase_client
+from utils.product_cache import ProductCache, ProjectionCache, CachedDataset
+from utils.snapshot import load_snapshot, save_snapshot
+from utils.prices import add_price_numeric
+from utils.perf import stage, timed
+from utils.resilience import call_with_retry
+from utils.single_flight import SingleFlight, coalesced
 import pandas as pd
 
-def fetch_all_products():
+PAGE_SIZE = int(os.getenv("PRODUCT_FETCH_PAGE_SIZE", "1000"))
+MAX_WORKERS = int(os.getenv("PRODUCT_FETCH_WORKERS", "4"))
+PAGINATION = os.getenv("PRODUCT_FETCH_PAGINATION", "offset")
+FULL_SYNC_INTERVAL_SECONDS = float(os.getenv("PRODUCT_FULL_SYNC_SECONDS", "3600"))
+ARROW_STRINGS = os.getenv("PRODUCT_ARROW_STRINGS", "false").lower() == "true"
+RESUME_SECONDS = float(os.getenv("PRODUCT_FETCH_RESUME_SECONDS", "600"))
+
+# Always fetched with any projection: needed for keyset paging and delta syncs
+KEY_COLUMNS = ('id', 'scraped_at')
+
+# Columns computed at load time, mapped to the column they are derived from
+DERIVED_COLUMNS = {'price_numeric': 'price'}
+
+# Target dtype kind of each known products column. Columns not listed are left as loaded.
+PRODUCT_SCHEMA = {
+    'id': 'integer',
+    'marketplace': 'category',
+    'in_stock': 'boolean',
+    'scraped_at': 'datetime',
+    'name': 'text',
+    'price': 'text',
+    'image_url': 'text',
+    'product_url': 'text',
+}
+
+# Identical queries in flight at the same time share one request
+_supabase_queries = SingleFlight('supabase.query')
+
+# Memory footprint of the most recent full load, see get_memory_report()
+_last_memory_report = {}
+
+def _text_dtype():
     """
-    Fetch all products from Supabase with pagination.
-    Supabase has a default limit of 1000 rows per query.
+    Get the dtype for free-text columns: Arrow-backed strings when enabled
+    and pyarrow is installed, otherwise None (keep the loaded dtype).
+    """
+    if not ARROW_STRINGS:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return 'string[pyarrow]'
+
+def _normalize_column(series, kind):
+    """
+    Convert one column to the compact dtype for its schema kind.
+    """
+    if kind == 'integer':
+        # Only tighten numeric ids; never coerce e.g. UUID strings to NA
+        if pd.api.types.is_numeric_dtype(series):
+            return series.astype('Int64')
+        return series
+    if kind == 'category':
+        return series.astype('category')
+    if kind == 'boolean':
+        return series.astype('boolean')
+    if kind == 'datetime':
+        return pd.to_datetime(series, utc=True, errors='coerce', format='ISO8601')
+    if kind == 'text':
+        text_dtype = _text_dtype()
+        return series.astype(text_dtype) if text_dtype else series
+    return series
+
+def normalize_products(frame):
+    """
+    Convert product columns to compact, typed dtypes following PRODUCT_SCHEMA:
+    categorical marketplace, nullable boolean/integer, tz-aware datetimes and
+    (optionally) Arrow-backed strings.
+    
+    Args:
+        frame: Product DataFrame
     
     Returns:
-        pandas.DataFrame: All products
+        pandas.DataFrame: The same frame with converted columns
+    """
+    for column, kind in PRODUCT_SCHEMA.items():
+        if column in frame.columns:
+            frame[column] = _normalize_column(frame[column], kind)
+    return frame
+
+def prepare_products(frame, report=False):
+    """
+    Derive typed columns once, when rows are loaded, so pages never re-parse them.
+    
+    Args:
+        frame: Raw product rows as returned by Supabase
+        report: Record the before/after memory footprint (see get_memory_report)
+    
+    Returns:
+        pandas.DataFrame: The same frame with derived and normalized columns
+    """
+    raw_bytes = int(frame.memory_usage(deep=True).sum()) if report else 0
+    
+    with stage('prices.parse', rows=len(frame)):
+        frame = add_price_numeric(frame)
+    with stage('schema.normalize', rows=len(frame)):
+        frame = normalize_products(frame)
+    
+    if report:
+        normalized_bytes = int(frame.memory_usage(deep=True).sum())
+        _last_memory_report.update({
+            'rows': len(frame),
+            'raw_bytes': raw_bytes,
+            'normalized_bytes': normalized_bytes,
+        })
+    
+    return frame
+
+def get_memory_report():
+    """
+    Get the memory footprint of the most recent full product load.
+    
+    Returns:
+        dict: rows, raw_bytes and normalized_bytes (empty before the first load)
+    """
+    return dict(_last_memory_report)
+
+def select_clause(columns):
+    """
+    Build the PostgREST select clause for a column projection.
+    
+    Args:
+        columns: Column names, or None for all columns
+    
+    Returns:
+        str: Comma separated column list, or '*'
+    """
+    if columns is None:
+        return '*'
+    return ','.join(sorted(columns))
+
+def _execute(query, operation):
+    """
+    Execute a query, retrying failures with backoff (see utils.resilience).
+    postgrest's own retries (up to 3 for 503/520 responses to GETs, with
+    sleeps of up to 4 s) are turned off, so these are the only ones and
+    every attempt counts toward the retry budget and the circuit breaker.
+    """
+    return call_with_retry(query.retry(False).execute, operation)
+
+@dataclass
+class _ScanProgress:
+    """
+    Rows of a keyset scan fetched so far, kept when the scan fails so the
+    next attempt resumes where it stopped instead of starting over. Offset
+    scans are not resumed: rows inserted or deleted in between would shift
+    the offsets and duplicate or skip rows.
+    
+    Attributes:
+        started_at: When the scan started; older progress is discarded
+        rows: Rows fetched so far, in id order
+        cursor: Last id seen
+    """
+    started_at: float = field(default_factory=time.time)
+    rows: list = field(default_factory=list)
+    cursor: object = None
+
+# Interrupted keyset scans by (projection, page size)
+_scan_progress = {}
+
+def _fetch_page(supabase, offset, page_size, columns=None):
+    """
+    Fetch a single page of products by row offset.
+    
+    Returns:
+        list: Rows of the page (may be shorter than page_size)
+    """
+    query = supabase.table('products')\
+        .select(select_clause(columns))\
+        .order('id')\
+        .range(offset, offset + page_size - 1)
+    return _execute(query, 'supabase.page').data or []
+
+def _fetch_pages_keyset(supabase, page_size, columns=None, progress=None):
+    """
+    Walk the table in primary key order, filtering on the last id seen.
+    Each page is an index range scan, so its cost doesn't grow with depth,
+    and rows written during the scan can't shift later pages.
+    """
+    progress = progress or _ScanProgress()
+    
+    while True:
+        query = supabase.table('products')\
+            .select(select_clause(columns))\
+            .order('id')\
+            .limit(page_size)
+        if progress.cursor is not None:
+            query = query.gt('id', progress.cursor)
+        page = _execute(query, 'supabase.page').data or []
+        
+        progress.rows.extend(page)
+        
+        if len(page) < page_size:
+            break
+        
+        progress.cursor = page[-1]['id']
+    
+    return progress.rows
+
+def _fetch_pages_sequential(supabase, page_size, offset=0, columns=None):
+    """
+    Walk pages one after another until a short page is returned.
     """
-    supabase = get_supabase_client()
     all_products = []
-    page_size = 1000
-    offset = 0
     
     while True:
-        # Fetch page with range
-        response = supabase.table('products')\
-            .select('*')\
-            .range(offset, offset + page_size - 1)\
-            .execute()
+        page = _fetch_page(supabase, offset, page_size, columns)
         
-        if not response.data:
+        if not page:
             break
         
-        all_products.extend(response.data)
+        all_products.extend(page)
         
         # If we got less than page_size, we're done
-        if len(response.data) < page_size:
+        if len(page) < page_size:
             break
         
         offset += page_size
     
-    return pd.DataFrame(all_products)
+    return all_products
+
+@timed('supabase.count')
+@coalesced(_supabase_queries)
+def count_products():
+    """
+    Get the exact number of rows in the products table.
+    
+    Returns:
+        int: Row count
+    """
+    supabase = get_supabase_client()
+    query = supabase.table('products')\
+        .select('id', count='exact')\
+        .limit(1)
+    return _execute(query, 'supabase.count').count or 0
+
+def _fetch_pages_parallel(supabase, page_size, max_workers, columns=None):
+    """
+    Count rows, then fetch every page concurrently and reassemble them in order.
+    """
+    total = count_products()
+    offsets = list(range(0, total, page_size))
+    
+    if not offsets:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() yields results in submission order, so pages stay ordered
+        pages = list(executor.map(lambda offset: _fetch_page(supabase, offset, page_size, columns), offsets))
+    
+    all_products = [row for page in pages for row in page]
+    
+    # Rows inserted after the count was taken spill past the last page
+    if len(pages[-1]) == page_size:
+        all_products.extend(_fetch_pages_sequential(supabase, page_size, offset=offsets[-1] + page_size, columns=columns))
+    
+    return all_products
+
+def _fetch_keyset_resumable(supabase, page_size, columns=None):
+    """
+    Run a keyset scan, resuming a recent one of the same projection that
+    failed part way through.
+    """
+    scan = (None if columns is None else frozenset(columns), page_size)
+    progress = _scan_progress.pop(scan, None)
+    if progress is not None and time.time() - progress.started_at > RESUME_SECONDS:
+        progress = None
+    if progress is not None:
+        print(f"Resuming product load after {len(progress.rows)} rows")
+    progress = progress or _ScanProgress()
+    
+    try:
+        return _fetch_pages_keyset(supabase, page_size, columns, progress)
+    except Exception:
+        _scan_progress[scan] = progress
+        raise
+
+def fetch_products_from_supabase(page_size=PAGE_SIZE, max_workers=MAX_WORKERS, pagination=PAGINATION, columns=None):
+    """
+    Fetch all products from Supabase with pagination.
+    Supabase has a default limit of 1000 rows per query, so page_size
+    should not exceed the project's max rows setting.
+    
+    Args:
+        page_size: Rows requested per page
+        max_workers: Concurrent page requests for offset pagination. With 1,
+            pages are fetched sequentially; otherwise the exact row count is
+            fetched first and all pages are requested through a bounded
+            thread pool.
+        pagination: 'offset' for range requests, or 'keyset' to page by
+            primary key (sequential, constant cost per page and consistent
+            under concurrent writes)
+        columns: Columns to select, or None for all columns
+    
+    Returns:
+        pandas.DataFrame: All products
+    """
+    supabase = get_supabase_client()
+    
+    with stage('supabase.fetch') as timing:
+        if pagination == 'keyset':
+            all_products = _fetch_keyset_resumable(supabase, page_size, columns)
+        elif max_workers > 1:
+            all_products = _fetch_pages_parallel(supabase, page_size, max_workers, columns)
+        else:
+            all_products = _fetch_pages_sequential(supabase, page_size, columns=columns)
+        timing.rows = len(all_products)
+    
+    with stage('dataframe.build', rows=len(all_products)):
+        frame = pd.DataFrame(all_products)
+    
+    return prepare_products(frame, report=True)
+
+@timed('supabase.delta')
+def fetch_products_changed_since(watermark, page_size=PAGE_SIZE, columns=None):
+    """
+    Fetch products scraped at or after the given watermark.
+    Rows on the watermark itself are re-fetched so writes sharing the same
+    timestamp are never skipped; the upsert makes this harmless.
+    
+    Args:
+        watermark: ISO timestamp of the newest row already held locally
+        page_size: Rows requested per page
+        columns: Columns to select, or None for all columns
+    
+    Returns:
+        pandas.DataFrame: Changed products
+    """
+    supabase = get_supabase_client()
+    changed = []
+    offset = 0
+    
+    while True:
+        query = supabase.table('products')\
+            .select(select_clause(columns))\
+            .gte('scraped_at', watermark)\
+            .order('scraped_at')\
+            .order('id')\
+            .range(offset, offset + page_size - 1)
+        
+        page = _execute(query, 'supabase.delta').data or []
+        changed.extend(page)
+        
+        if len(page) < page_size:
+            break
+        
+        offset += page_size
+    
+    return prepare_products(pd.DataFrame(changed))
+
+def _escape_like(term):
+    """
+    Escape LIKE wildcards so a search word only matches literally.
+    """
+    for char in ('\\', '%', '_'):
+        term = term.replace(char, '\\' + char)
+    return term
+
+def _apply_product_filters(query, marketplace=None, in_stock=None, search_words=()):
+    """
+    Add the Products page filters to a PostgREST query.
+    """
+    if marketplace is not None:
+        query = query.eq('marketplace', marketplace)
+    
+    if in_stock is not None:
+        query = query.eq('in_stock', in_stock)
+    
+    # Chained filters are ANDed, matching the local multi-word search
+    for word in search_words:
+        query = query.ilike('name', f"%{_escape_like(word)}%")
+    
+    return query
+
+@timed('supabase.query')
+@coalesced(_supabase_queries)
+def query_products(marketplace=None, in_stock=None, search_words=(), page=1, page_size=50,
+                   columns=None, order_by='name', descending=False):
+    """
+    Query one page of products with the filters applied by Supabase.
+    Only the requested page and its exact match count are transferred.
+    
+    Args:
+        marketplace: Only return products from this marketplace
+        in_stock: Only return products with this stock status
+        search_words: Words that must all appear in the product name
+            (case-insensitive)
+        page: 1-based page number
+        page_size: Rows per page
+        columns: Columns to select, or None for all columns
+        order_by: Column to sort by; ties are broken by id
+        descending: Sort direction
+    
+    Returns:
+        tuple: (pandas.DataFrame with the page rows, int total matching rows)
+    """
+    supabase = get_supabase_client()
+    query = supabase.table('products')\
+        .select(select_clause(columns), count='exact')
+    query = _apply_product_filters(query, marketplace, in_stock, search_words)
+    
+    offset = (page - 1) * page_size
+    query = query\
+        .order(order_by, desc=descending)\
+        .order('id')\
+        .range(offset, offset + page_size - 1)
+    response = _execute(query, 'supabase.query')
+    
+    return prepare_products(pd.DataFrame(response.data or [])), response.count or 0
+
+def _high_water_mark(frame):
+    """
+    Get the newest scraped_at value of a frame as an ISO string, or None.
+    """
+    if 'scraped_at' not in frame.columns or frame.empty:
+        return None
+    
+    newest = pd.to_datetime(frame['scraped_at'], utc=True, errors='coerce').max()
+    return None if pd.isna(newest) else newest.isoformat()
+
+def _drop_unchanged(frame, changed):
+    """
+    Drop delta rows already held locally with the same scraped_at.
+    """
+    known = frame.drop_duplicates('id', keep='last').set_index('id')['scraped_at']
+    previous = pd.to_datetime(changed['id'].map(known), utc=True, errors='coerce')
+    current = pd.to_datetime(changed['scraped_at'], utc=True, errors='coerce')
+    return changed[previous.ne(current)]
+
+def _align_categories(kept, changed):
+    """
+    Give categorical columns of both frames the same categories, so
+    concatenating them keeps the categorical dtype instead of falling back
+    to object.
+    """
+    kept = kept.copy(deep=False)
+    changed = changed.copy(deep=False)
+    
+    for column in kept.columns:
+        if not isinstance(kept[column].dtype, pd.CategoricalDtype) or column not in changed.columns:
+            continue
+        existing = kept[column].cat.categories
+        new_values = pd.Index(changed[column].dropna().astype(object).unique())
+        categories = existing.append(new_values.difference(existing))
+        kept[column] = kept[column].cat.set_categories(categories)
+        changed[column] = changed[column].astype(pd.CategoricalDtype(categories))
+    
+    return kept, changed
+
+def upsert_products(frame, changed):
+    """
+    Merge changed rows into a product frame by primary key.
+    
+    Args:
+        frame: Current product frame
+        changed: Rows to insert or replace, matched on 'id'
+    
+    Returns:
+        pandas.DataFrame: New frame; the inputs are not modified
+    """
+    if changed.empty:
+        return frame
+    
+    kept = frame[~frame['id'].isin(changed['id'])]
+    kept, changed = _align_categories(kept, changed)
+    return pd.concat([kept, changed], ignore_index=True)
+
+def delete_products(frame, ids):
+    """
+    Drop rows from a product frame by primary key.
+    
+    Args:
+        frame: Current product frame
+        ids: Primary keys to remove
+    
+    Returns:
+        pandas.DataFrame: New frame, or the same frame if no row matched
+    """
+    removed = frame['id'].isin(list(ids))
+    if not removed.any():
+        return frame
+    return frame[~removed].reset_index(drop=True)
+
+class ProductSync:
+    """
+    Locally materialized product table kept current with delta syncs.
+    
+    The first load and every periodic reconciliation pull the full table,
+    which also drops rows deleted upstream. In between, only rows whose
+    scraped_at moved past the high-water mark are fetched and upserted.
+    """
+    
+    def __init__(self, columns=None, full_sync_interval=FULL_SYNC_INTERVAL_SECONDS):
+        """
+        Args:
+            columns: Columns to materialize, or None for all columns
+            full_sync_interval: Seconds between full reconciliations
+        """
+        self.columns = columns
+        self.full_sync_interval = full_sync_interval
+        self.frame = None
+        self.watermark = None
+        self.last_full_sync = 0.0
+    
+    def load(self):
+        """
+        Bring the local frame up to date and return it.
+        
+        Returns:
+            pandas.DataFrame: Current products. The same object is returned
+                when nothing changed since the last load.
+        """
+        full_sync_due = time.time() - self.last_full_sync >= self.full_sync_interval
+        
+        if self.frame is None or self.watermark is None or full_sync_due:
+            return self.full_sync()
+        
+        changed = fetch_products_changed_since(self.watermark, columns=self.columns)
+        if changed.empty:
+            return self.frame
+        
+        # Advanced from polled rows only; pushed rows may have skipped some
+        self.watermark = _high_water_mark(changed) or self.watermark
+        changed = _drop_unchanged(self.frame, changed)
+        if changed.empty:
+            return self.frame
+        
+        self.frame = upsert_products(self.frame, changed)
+        return self.frame
+    
+    def full_sync(self):
+        """
+        Reload the whole table and reset the watermark.
+        
+        Returns:
+            pandas.DataFrame: All products
+        """
+        self.frame = fetch_products_from_supabase(columns=self.columns)
+        self.last_full_sync = time.time()
+        # Without a key and timestamp, deltas can't be applied; keep doing full loads
+        if 'id' in self.frame.columns:
+            self.watermark = _high_water_mark(self.frame)
+        else:
+            self.watermark = None
+        return self.frame
+    
+    def apply_changes(self, records=(), deleted_ids=()):
+        """
+        Apply pushed row changes (e.g. realtime events) to the local frame.
+        
+        Args:
+            records: Inserted or updated rows, as returned by Supabase
+            deleted_ids: Primary keys of deleted rows
+        
+        Returns:
+            pandas.DataFrame: Updated products. The same object is returned
+                when nothing changed.
+        """
+        if self.frame is None or 'id' not in self.frame.columns:
+            return self.frame
+        
+        frame = delete_products(self.frame, deleted_ids) if deleted_ids else self.frame
+        
+        if records:
+            changed = prepare_products(pd.DataFrame(list(records)))
+            # Keep to this sync's projection; derived columns come along with their source
+            changed = changed[[column for column in frame.columns if column in changed.columns]]
+            frame = upsert_products(frame, changed)
+        
+        # The watermark stays where the last polled load left it, so rows
+        # whose events were missed are still picked up by the next delta sync
+        self.frame = frame
+        return self.frame
+    
+    def reset(self):
+        """
+        Force the next load to be a full reconciliation.
+        """
+        self.last_full_sync = 0.0
+    
+    def restore(self):
+        """
+        Restore the frame and watermark from the on-disk snapshot, if any.
+        The next load then only syncs what changed since the snapshot.
+        
+        Returns:
+            CachedDataset or None: The restored dataset
+        """
+        snapshot = load_snapshot(self.columns)
+        if snapshot is None:
+            return None
+        
+        self.frame = snapshot.frame
+        self.watermark = snapshot.watermark
+        self.last_full_sync = snapshot.last_full_sync
+        print(f"Restored {len(snapshot.frame)} products from snapshot (version {snapshot.version})")
+        return CachedDataset(frame=snapshot.frame, version=snapshot.version, loaded_at=snapshot.saved_at)
+    
+    def persist(self, dataset):
+        """
+        Write a newly cached dataset to the on-disk snapshot.
+        
+        Args:
+            dataset: CachedDataset holding this sync's current frame
+        """
+        save_snapshot(dataset.frame, self.columns, dataset.version, self.watermark, self.last_full_sync)
+
+# One synced frame per column projection, shared by every session and page;
+# concurrent cold loads of a projection share one Supabase scan
+_product_loads = SingleFlight('products.load')
+_product_syncs = {}
+_product_caches = {}
+
+def _make_product_cache(columns):
+    sync = ProductSync(columns=columns)
+    cache = ProductCache(
+        sync.load,
+        restore=sync.restore,
+        on_store=sync.persist,
+        flight=_product_loads,
+        flight_key=('products', columns)
+    )
+    _product_syncs[columns] = sync
+    _product_caches[columns] = cache
+    return cache
+
+_product_cache = ProjectionCache(
+    _make_product_cache,
+    required_columns=KEY_COLUMNS,
+    derived_columns=DERIVED_COLUMNS
+)
+
+def get_products_dataset(columns=None) -> CachedDataset:
+    """
+    Get the cached product dataset together with its version stamp.
+    
+    Args:
+        columns: Columns the caller needs, or None for all columns. Narrow
+            projections are served from a wider cached frame when one exists.
+    
+    Returns:
+        CachedDataset: Product frame, version and load time
+    """
+    with stage('cache.get') as timing:
+        dataset = _product_cache.get(columns)
+        timing.rows = len(dataset.frame)
+    return dataset
+
+def fetch_all_products(columns=None):
+    """
+    Fetch all products, served from the process-wide product cache.
+    The returned frame is shared across sessions and must not be mutated.
+    
+    Args:
+        columns: Columns the caller needs, or None for all columns.
+            'id' and 'scraped_at' are always included, and 'price_numeric'
+            whenever 'price' is.
+    
+    Returns:
+        pandas.DataFrame: All products
+    """
+    return get_products_dataset(columns).frame
+
+def invalidate_products_cache(hard=False):
+    """
+    Invalidate the cached product dataset.
+    
+    Args:
+        hard: If True, the next fetch blocks on a full reload instead of
+            serving the stale copy while a delta sync runs in the background
+    """
+    if hard:
+        for sync in list(_product_syncs.values()):
+            sync.reset()
+    _product_cache.invalidate(hard=hard)
+
+def apply_product_changes(records=(), deleted_ids=()):
+    """
+    Apply pushed row changes to every loaded product projection, bumping
+    their dataset versions. Search indexes, aggregates and projected slices
+    are keyed by version, so they follow on their next use.
+    
+    Args:
+        records: Inserted or updated rows with all columns
+        deleted_ids: Primary keys of deleted rows
+    
+    Returns:
+        int: Number of projections whose frame changed
+    """
+    updated = 0
+    for columns, cache in list(_product_caches.items()):
+        sync = _product_syncs[columns]
+        version = cache.version
+        dataset = cache.update(lambda sync=sync: sync.apply_changes(records, deleted_ids))
+        if dataset is not None and dataset.version != version:
+            updated += 1
+    return updated
@@ -0,0 +1,244 @@
+"""
+On-demand product exports (CSV, Parquet, XLSX).
+
+Files are only built when a user asks for one, are written to disk in
+chunks of rows so a large result is never serialized into memory at once,
+and are cached by dataset version and filter signature so repeated
+downloads of the same result are free.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+EXPORT_CHUNK_ROWS = int(os.getenv("PRODUCT_EXPORT_CHUNK_ROWS", "50000"))
+
+# Excel's sheet limit, minus the header row
+XLSX_MAX_ROWS = 1048575
+
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'text/csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+@dataclass(frozen=True)
+class ExportFile:
+    """
+    A generated export on disk.
+    
+    Attributes:
+        path: Location of the file
+        file_name: Suggested download name
+        mime: MIME type
+        rows: Number of exported rows
+        size: File size in bytes
+    """
+    path: str
+    file_name: str
+    mime: str
+    rows: int
+    size: int
+    
+    def open(self):
+        """
+        Open the file for reading (binary), e.g. to hand to a download button.
+        """
+        return open(self.path, 'rb')
+
+def _pyarrow_parquet():
+    """
+    Import pyarrow.parquet, or None if pyarrow is not installed.
+    """
+    try:
+        import pyarrow.parquet as parquet
+    except ImportError:
+        return None
+    return parquet
+
+def _openpyxl():
+    """
+    Import openpyxl, or None if it is not installed.
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        return None
+    return openpyxl
+
+def available_formats():
+    """
+    Get the export formats whose libraries are installed.
+    
+    Returns:
+        list: Format keys of EXPORT_FORMATS
+    """
+    formats = ['csv']
+    if _pyarrow_parquet() is not None:
+        formats.append('parquet')
+    if _openpyxl() is not None:
+        formats.append('xlsx')
+    return formats
+
+def _chunks(frame, positions, columns, chunk_rows):
+    """
+    Yield the selected rows in order, chunk_rows at a time.
+    """
+    if columns is not None:
+        columns = [column for column in columns if column in frame.columns]
+    # Always at least one (possibly empty) chunk, so empty results still get a header
+    for start in range(0, max(len(positions), 1), chunk_rows):
+        chunk = frame.iloc[positions[start:start + chunk_rows]]
+        yield chunk if columns is None else chunk[columns]
+
+def _write_csv(path, chunks):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for number, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=number == 0)
+
+def _write_parquet(path, chunks):
+    import pyarrow as pa
+    parquet = _pyarrow_parquet()
+    
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _excel_values(chunk):
+    """
+    Convert a chunk to plain Python rows Excel can store (no NA, no time zones).
+    """
+    chunk = chunk.copy()
+    for column in chunk.columns:
+        if isinstance(chunk[column].dtype, pd.DatetimeTZDtype):
+            chunk[column] = chunk[column].dt.tz_localize(None)
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None)
+
+def _write_xlsx(path, chunks):
+    # Write-only workbooks stream rows to disk instead of building the sheet in memory
+    workbook = _openpyxl().Workbook(write_only=True)
+    sheet = workbook.create_sheet('products')
+    written = 0
+    for number, chunk in enumerate(chunks):
+        if number == 0:
+            sheet.append([str(column) for column in chunk.columns])
+        chunk = chunk.iloc[:XLSX_MAX_ROWS - written]
+        for row in _excel_values(chunk):
+            sheet.append(row)
+        written += len(chunk)
+        if written >= XLSX_MAX_ROWS:
+            break
+    workbook.save(path)
+
+_WRITERS = {
+    'csv': _write_csv,
+    'parquet': _write_parquet,
+    'xlsx': _write_xlsx,
+}
+
+def export_key(version, signature, fmt, columns=None):
+    """
+    Build the cache key of an export.
+    
+    Args:
+        version: Dataset version the rows come from
+        signature: Hashable description of the filters and sort order
+        fmt: Format key of EXPORT_FORMATS
+        columns: Exported columns, or None for all columns
+    
+    Returns:
+        str: Cache key
+    """
+    text = repr((version, signature, fmt, None if columns is None else tuple(columns)))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+# Built exports by key, oldest evicted (and deleted) first
+_EXPORT_CACHE_SIZE = 8
+_exports = {}
+_export_dir = None
+_exports_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+def get_export(key) -> Optional[ExportFile]:
+    """
+    Get an already built export.
+    
+    Args:
+        key: Key from export_key
+    
+    Returns:
+        ExportFile or None: The export, or None if it hasn't been built
+    """
+    with _exports_lock:
+        export = _exports.get(key)
+    if export is not None and not os.path.exists(export.path):
+        return None
+    return export
+
+def build_export(key, frame, positions=None, fmt='csv', columns=None, file_name='products',
+                 chunk_rows=EXPORT_CHUNK_ROWS) -> ExportFile:
+    """
+    Write the selected rows to a file, or return the cached file for key.
+    
+    Args:
+        key: Key from export_key
+        frame: Product DataFrame
+        positions: Row positions to export, in order (None for every row)
+        fmt: Format key of EXPORT_FORMATS
+        columns: Columns to export, or None for all columns
+        file_name: Download name without extension
+        chunk_rows: Rows converted and written at a time
+    
+    Returns:
+        ExportFile: The generated file
+    """
+    global _export_dir
+    
+    if fmt not in available_formats():
+        raise ValueError(f"Export format not available: {fmt}")
+    
+    # One build at a time: a double click shouldn't write the file twice
+    with _build_lock:
+        export = get_export(key)
+        if export is not None:
+            return export
+        
+        if positions is None:
+            positions = np.arange(len(frame))
+        if _export_dir is None:
+            _export_dir = tempfile.mkdtemp(prefix='product-exports-')
+        
+        path = os.path.join(_export_dir, f'{key}.{fmt}')
+        _WRITERS[fmt](path, _chunks(frame, positions, columns, chunk_rows))
+        
+        rows = min(len(positions), XLSX_MAX_ROWS) if fmt == 'xlsx' else len(positions)
+        export = ExportFile(
+            path=path,
+            file_name=f'{file_name}.{fmt}',
+            mime=EXPORT_FORMATS[fmt][1],
+            rows=rows,
+            size=os.path.getsize(path),
+        )
+        
+        with _exports_lock:
+            _exports[key] = export
+            while len(_exports) > _EXPORT_CACHE_SIZE:
+                evicted = _exports.pop(next(iter(_exports)))
+                try:
+                    os.remove(evicted.path)
+                except OSError:
+                    pass
+        return export
@@ -0,0 +1,393 @@
+"""
+In-memory stand-in for the Supabase client, for offline development and testing.
+
+Supports the subset of the PostgREST query builder used by the app, the
+marketplace_stats view and the price_histogram RPC defined in
+sql/marketplace_stats.sql, and password sign-in with locally minted tokens.
+"""
+import fnmatch
+import secrets
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import jwt
+import pandas as pd
+
+from utils.aggregations import compute_marketplace_stats, price_histogram
+from utils.prices import parse_clp_prices
+
+@dataclass
+class FakeResponse:
+    """Mimics postgrest's APIResponse."""
+    data: List[dict]
+    count: Optional[int] = None
+
+class FakeQuery:
+    """
+    Chainable query over an in-memory table.
+    """
+    
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._columns = None
+        self._count = None
+        self._filters = []
+        self._orders = []
+        self._offset = 0
+        self._limit = None
+    
+    def select(self, *columns, count=None):
+        selected = ','.join(columns).replace(' ', '')
+        self._columns = None if selected in ('', '*') else selected.split(',')
+        self._count = count
+        return self
+    
+    def eq(self, column, value):
+        return self._filter(column, lambda cell: cell == value)
+    
+    def neq(self, column, value):
+        return self._filter(column, lambda cell: cell != value)
+    
+    def gt(self, column, value):
+        return self._filter(column, lambda cell: cell > value)
+    
+    def gte(self, column, value):
+        return self._filter(column, lambda cell: cell >= value)
+    
+    def lt(self, column, value):
+        return self._filter(column, lambda cell: cell < value)
+    
+    def lte(self, column, value):
+        return self._filter(column, lambda cell: cell <= value)
+    
+    def in_(self, column, values):
+        return self._filter(column, lambda cell: cell in values)
+    
+    def ilike(self, column, pattern):
+        # Translate LIKE wildcards (with backslash escapes) to fnmatch syntax
+        translated = []
+        escaped = False
+        for char in pattern.lower():
+            if escaped:
+                translated.append('[' + char + ']' if char in '[]*?' else char)
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '%':
+                translated.append('*')
+            elif char == '_':
+                translated.append('?')
+            elif char in '[]*?':
+                translated.append('[' + char + ']')
+            else:
+                translated.append(char)
+        glob = ''.join(translated)
+        return self._filter(column, lambda cell: fnmatch.fnmatchcase(str(cell).lower(), glob))
+    
+    def order(self, column, desc=False):
+        self._orders.append((column, desc))
+        return self
+    
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+    
+    def limit(self, size):
+        self._limit = size
+        return self
+    
+    def retry(self, enabled):
+        # Nothing is retried here; kept for postgrest's builder interface
+        return self
+    
+    def execute(self):
+        rows = self._client.ordered_rows(self._table, tuple(self._orders))
+        if self._filters:
+            rows = [row for row in rows if all(check(row) for check in self._filters)]
+        
+        total = len(rows)
+        limit = self._client.max_rows if self._limit is None else min(self._limit, self._client.max_rows)
+        rows = rows[self._offset:self._offset + limit]
+        
+        if self._columns is not None:
+            rows = [{column: row.get(column) for column in self._columns} for row in rows]
+        
+        self._client.record_request(self._table, len(rows))
+        return FakeResponse(data=rows, count=total if self._count else None)
+    
+    def _filter(self, column, check):
+        self._filters.append(lambda row: row.get(column) is not None and check(row.get(column)))
+        return self
+
+class FakeRpc:
+    """
+    Deferred RPC call, executed like a query.
+    """
+    
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+    
+    def retry(self, enabled):
+        return self
+    
+    def execute(self):
+        if self._name != 'price_histogram':
+            raise ValueError(f"Unknown RPC: {self._name}")
+        
+        prices = parse_clp_prices(pd.Series([row.get('price') for row in self._client.rows('products')], dtype=object))
+        histogram = price_histogram(prices, bins=self._params.get('bins', 30))
+        self._client.record_request(self._name, len(histogram))
+        return FakeResponse(data=histogram.to_dict('records'))
+
+@dataclass
+class FakeUser:
+    """Mimics supabase_auth's User."""
+    id: str
+    email: str
+
+@dataclass
+class FakeSession:
+    """Mimics supabase_auth's Session."""
+    access_token: str
+    refresh_token: str
+    expires_at: int
+    user: FakeUser
+
+@dataclass
+class FakeAuthResponse:
+    """Mimics supabase_auth's AuthResponse."""
+    user: Optional[FakeUser]
+    session: Optional[FakeSession]
+
+class FakeAuth:
+    """
+    Password sign-in issuing HS256 access tokens signed with `secret`, so
+    utils.auth_session can verify them like real Supabase tokens.
+    """
+    
+    def __init__(self, users: Optional[Dict[str, str]] = None, secret: str = 'fake-jwt-secret-for-offline-development',
+                 expires_in: int = 3600, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            users: Email -> password of the accounts that can sign in
+            secret: JWT secret the tokens are signed with
+            expires_in: Access token lifetime in seconds
+            clock: Time source for the issued tokens
+        """
+        self.users = dict(users or {})
+        self.secret = secret
+        self.expires_in = expires_in
+        self.clock = clock
+        self.session: Optional[FakeSession] = None
+        self.refreshes = 0
+        self._ids = {}
+        # Refresh token -> user; each refresh token can be used once
+        self._refresh_tokens = {}
+    
+    def mint_access_token(self, user: FakeUser) -> str:
+        now = int(self.clock())
+        return jwt.encode({
+            'sub': user.id,
+            'email': user.email,
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'iat': now,
+            'exp': now + self.expires_in,
+        }, self.secret, algorithm='HS256')
+    
+    def _issue(self, user):
+        refresh_token = secrets.token_urlsafe(16)
+        self._refresh_tokens[refresh_token] = user
+        self.session = FakeSession(
+            access_token=self.mint_access_token(user),
+            refresh_token=refresh_token,
+            expires_at=int(self.clock()) + self.expires_in,
+            user=user,
+        )
+        return FakeAuthResponse(user=user, session=self.session)
+    
+    def sign_in_with_password(self, credentials):
+        email = credentials.get('email')
+        if email not in self.users or self.users[email] != credentials.get('password'):
+            raise ValueError("Invalid login credentials")
+        user = FakeUser(id=self._ids.setdefault(email, str(uuid.uuid4())), email=email)
+        return self._issue(user)
+    
+    def refresh_session(self, refresh_token=None):
+        user = self._refresh_tokens.pop(refresh_token, None)
+        if user is None:
+            raise ValueError("Invalid Refresh Token")
+        self.refreshes += 1
+        return self._issue(user)
+    
+    def sign_out(self):
+        self.session = None
+    
+    def reset_password_for_email(self, email):
+        pass
+
+class FakeSupabaseClient:
+    """
+    Minimal Supabase client over in-memory product rows.
+    
+    The 'marketplace_stats' table is computed from the products on every
+    request, like the SQL view it stands in for.
+    """
+    
+    def __init__(self, products: Optional[List[dict]] = None, max_rows: int = 1000, latency: float = 0.0,
+                 auth: Optional[FakeAuth] = None):
+        """
+        Args:
+            products: Rows of the products table
+            max_rows: Server-side cap on rows per response, like PostgREST's max-rows
+            latency: Seconds each request takes, like a network round trip
+            auth: Auth stand-in (defaults to one without accounts)
+        """
+        self.auth = auth or FakeAuth()
+        self._lock = threading.Lock()
+        self._ordered = {}
+        self.products = list(products or [])
+        self.max_rows = max_rows
+        self.latency = latency
+        self.requests = 0
+        self.rows_served = 0
+    
+    @property
+    def products(self) -> List[dict]:
+        return self._products
+    
+    @products.setter
+    def products(self, rows: List[dict]):
+        # Replace the list rather than mutating it, so sorted copies are dropped
+        with self._lock:
+            self._products = rows
+            self._ordered.clear()
+    
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+    
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeRpc:
+        return FakeRpc(self, name, params)
+    
+    def rows(self, table: str) -> List[dict]:
+        if table == 'products':
+            return list(self.products)
+        if table == 'marketplace_stats':
+            return self._marketplace_stats()
+        raise ValueError(f"Unknown table: {table}")
+    
+    def ordered_rows(self, table: str, orders=()) -> List[dict]:
+        """
+        Rows of a table in ORDER BY order, memoized until the products change,
+        so paging through a large table doesn't re-sort it for every page.
+        
+        Args:
+            table: Table name
+            orders: (column, desc) pairs, most significant first
+        
+        Returns:
+            list: Rows (shared; do not mutate)
+        """
+        key = (table, orders)
+        with self._lock:
+            rows = self._ordered.get(key)
+        if rows is not None:
+            return rows
+        
+        rows = self.rows(table)
+        # Stable sorts applied last-to-first give a multi-column ORDER BY
+        for column, desc in reversed(orders):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        
+        with self._lock:
+            self._ordered[key] = rows
+        return rows
+    
+    def record_request(self, target: Any, rows: int):
+        with self._lock:
+            self.requests += 1
+            self.rows_served += rows
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def _marketplace_stats(self):
+        frame = pd.DataFrame(self.products)
+        if frame.empty:
+            return []
+        frame['price_numeric'] = parse_clp_prices(frame['price'])
+        missing = frame['marketplace'].isna()
+        rows = compute_marketplace_stats(frame[~missing]).by_marketplace.to_dict('records')
+        # Like the view, products without a marketplace get a row of their own
+        if missing.any():
+            unknown = compute_marketplace_stats(frame[missing].assign(marketplace=''))
+            rows += [{**row, 'marketplace': None} for row in unknown.by_marketplace.to_dict('records')]
+        return rows
+
+class FakeChangeSource:
+    """
+    Local stand-in for Supabase Realtime (see utils.realtime).
+    
+    Events are delivered synchronously to subscribers. The insert/update/delete
+    helpers also write to a FakeSupabaseClient, so polling and pushed changes
+    see the same table.
+    """
+    
+    def __init__(self, client: Optional[FakeSupabaseClient] = None, table: str = 'products'):
+        self.client = client
+        self.table = table
+        self._callbacks = []
+    
+    def start(self, callback):
+        self._callbacks.append(callback)
+    
+    def stop(self):
+        self._callbacks.clear()
+    
+    def emit(self, change_type, record=None, old_record=None):
+        """
+        Deliver one change in the Realtime postgres_changes payload format.
+        """
+        payload = {
+            'data': {
+                'schema': 'public',
+                'table': self.table,
+                'commit_timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+                'type': change_type,
+                'errors': None,
+                'columns': [],
+                'record': record,
+                'old_record': old_record,
+            },
+            'ids': [],
+        }
+        for callback in list(self._callbacks):
+            callback(payload)
+    
+    def insert(self, record):
+        if self.client is not None:
+            self.client.products = self.client.products + [dict(record)]
+        self.emit('INSERT', record=dict(record))
+    
+    def update(self, record):
+        old_record = {'id': record['id']}
+        if self.client is not None:
+            products = list(self.client.products)
+            for position, row in enumerate(products):
+                if row.get('id') == record['id']:
+                    old_record = row
+                    record = products[position] = {**row, **record}
+                    break
+            self.client.products = products
+        self.emit('UPDATE', record=dict(record), old_record=old_record)
+    
+    def delete(self, product_id):
+        if self.client is not None:
+            self.client.products = [row for row in self.client.products if row.get('id') != product_id]
+        self.emit('DELETE', old_record={'id': product_id})
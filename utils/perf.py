@@ -0,0 +1,289 @@
+"""
+Lightweight per-stage timing for page reruns and data loads.
+
+Each script run starts a Trace; code wrapped in stage() (or decorated with
+timed()) appends its duration, row count and payload size to the trace of
+the run it executes in. Stages running outside a script run, like
+background cache refreshes, only feed the process-wide totals.
+
+Finished traces are kept in memory for the admin performance panel, can be
+appended to a JSON-lines log (PERF_LOG_PATH), and the totals can be scraped
+in Prometheus text format from PERF_METRICS_PORT.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+PERF_ENABLED = os.getenv("PERF_TRACING", "true").lower() == "true"
+PERF_LOG_PATH = os.getenv("PERF_LOG_PATH", "")
+PERF_METRICS_PORT = int(os.getenv("PERF_METRICS_PORT", "0"))
+
+# Finished traces kept for the panel and export
+_RECENT_TRACES = 200
+
+@dataclass
+class StageTiming:
+    """
+    One timed stage.
+    
+    Attributes:
+        name: Stage name, dotted by area (e.g. 'supabase.fetch')
+        seconds: Wall-clock duration
+        rows: Rows produced or handled, if known
+        payload_bytes: Payload size in bytes, if known
+    """
+    name: str
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    payload_bytes: Optional[int] = None
+
+@dataclass
+class Trace:
+    """
+    Stages recorded during one script run.
+    
+    Attributes:
+        page: Page name
+        started_at: Unix timestamp of the run start
+        stages: Timed stages in completion order
+        seconds: Duration of the whole run (set when finished)
+    """
+    page: str
+    started_at: float
+    stages: List[StageTiming] = field(default_factory=list)
+    seconds: Optional[float] = None
+    
+    def to_dict(self):
+        return asdict(self)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('perf_trace', default=None)
+_recent = deque(maxlen=_RECENT_TRACES)
+# Process-wide totals per stage name: calls, seconds, max_seconds, rows, bytes
+_totals = {}
+_lock = threading.Lock()
+_metrics_server = None
+
+def start_trace(page) -> Optional[Trace]:
+    """
+    Start tracing the current script run. Call at the top of a page.
+    
+    Args:
+        page: Page name
+    
+    Returns:
+        Trace or None: The new trace (None when tracing is disabled)
+    """
+    if not PERF_ENABLED:
+        return None
+    _start_metrics_server()
+    trace = Trace(page=page, started_at=time.time())
+    _current_trace.set(trace)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace of the current script run, if any."""
+    return _current_trace.get()
+
+def finish_trace() -> Optional[Trace]:
+    """
+    Finish the current trace: record it for the panel and write it to the log.
+    
+    Returns:
+        Trace or None: The finished trace
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.seconds is not None:
+        return trace
+    trace.seconds = time.time() - trace.started_at
+    
+    with _lock:
+        _recent.append(trace)
+    
+    if PERF_LOG_PATH:
+        try:
+            with open(PERF_LOG_PATH, 'a') as f:
+                f.write(json.dumps(trace.to_dict()) + '\n')
+        except OSError as e:
+            print(f"Error writing performance log: {e}")
+    return trace
+
+@contextmanager
+def stage(name, rows=None, payload_bytes=None):
+    """
+    Time a block of code.
+    
+    The yielded StageTiming can be updated inside the block, e.g. with the
+    row count once it is known.
+    
+    Args:
+        name: Stage name
+        rows: Row count, if known up front
+        payload_bytes: Payload size, if known up front
+    
+    Yields:
+        StageTiming: The timing being recorded
+    """
+    timing = StageTiming(name=name, rows=rows, payload_bytes=payload_bytes)
+    if not PERF_ENABLED:
+        yield timing
+        return
+    
+    started = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.seconds = time.perf_counter() - started
+        _record(timing)
+
+def timed(name):
+    """
+    Decorator timing every call of a function as a stage. When the function
+    returns something with a length (a DataFrame, a list), it is used as the
+    row count.
+    
+    Args:
+        name: Stage name
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as timing:
+                result = func(*args, **kwargs)
+                frame = result[0] if isinstance(result, tuple) and result else result
+                if hasattr(frame, '__len__'):
+                    timing.rows = len(frame)
+                return result
+        return wrapper
+    return decorator
+
+def traced(page):
+    """
+    Decorator for code that can also run on its own, like a Streamlit
+    fragment: inside a traced script run it records into that run's trace,
+    otherwise (a fragment rerun) it starts and finishes a trace of its own.
+    
+    Args:
+        page: Trace name for standalone runs
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is not None and trace.seconds is None:
+                return func(*args, **kwargs)
+            start_trace(page)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                finish_trace()
+                _current_trace.set(None)
+        return wrapper
+    return decorator
+
+def frame_bytes(frame) -> int:
+    """
+    Approximate size of a DataFrame sent to the browser.
+    """
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+def recent_traces(page=None) -> List[Trace]:
+    """
+    Get recently finished traces, oldest first.
+    
+    Args:
+        page: Only traces of this page, or None for all pages
+    """
+    with _lock:
+        traces = list(_recent)
+    return [trace for trace in traces if page is None or trace.page == page]
+
+def stage_totals() -> dict:
+    """
+    Get process-wide totals per stage name.
+    
+    Returns:
+        dict: Stage name -> calls, seconds, max_seconds, rows and bytes
+    """
+    with _lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+def export_traces() -> str:
+    """
+    Recent traces as JSON lines, one trace per line.
+    """
+    return ''.join(json.dumps(trace.to_dict()) + '\n' for trace in recent_traces())
+
+def render_metrics() -> str:
+    """
+    Stage totals in the Prometheus text exposition format.
+    """
+    metrics = [
+        ('dashboard_stage_calls_total', 'counter', 'calls'),
+        ('dashboard_stage_seconds_total', 'counter', 'seconds'),
+        ('dashboard_stage_seconds_max', 'gauge', 'max_seconds'),
+        ('dashboard_stage_rows_total', 'counter', 'rows'),
+        ('dashboard_stage_bytes_total', 'counter', 'bytes'),
+    ]
+    totals = stage_totals()
+    lines = []
+    for metric, kind, key in metrics:
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, values in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{name}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
+
+def _record(timing):
+    trace = _current_trace.get()
+    with _lock:
+        if trace is not None and trace.seconds is None:
+            trace.stages.append(timing)
+        totals = _totals.setdefault(timing.name, {
+            'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'bytes': 0,
+        })
+        totals['calls'] += 1
+        totals['seconds'] += timing.seconds
+        totals['max_seconds'] = max(totals['max_seconds'], timing.seconds)
+        totals['rows'] += timing.rows or 0
+        totals['bytes'] += timing.payload_bytes or 0
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def _start_metrics_server():
+    """
+    Serve /metrics on PERF_METRICS_PORT (once per process), if configured.
+    """
+    global _metrics_server
+    
+    if not PERF_METRICS_PORT or _metrics_server is not None:
+        return
+    with _lock:
+        if _metrics_server is not None:
+            return
+        try:
+            _metrics_server = ThreadingHTTPServer(('0.0.0.0', PERF_METRICS_PORT), _MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics endpoint on port {PERF_METRICS_PORT}: {e}")
+            _metrics_server = False
+            return
+    threading.Thread(target=_metrics_server.serve_forever, name='perf-metrics', daemon=True).start()
@@ -0,0 +1,123 @@
+"""
+Admin sidebar panel showing where the current rerun spent its time.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from utils.data_fetcher import get_memory_report
+from utils.perf import PERF_ENABLED, export_traces, finish_trace, frame_bytes, stage, stage_totals
+from utils.resilience import request_stats, supabase_breaker
+from utils.single_flight import single_flight_stats
+
+# Emails allowed to see the panel, comma separated ('*' for every user)
+PERF_ADMIN_EMAILS = {
+    email.strip().lower() for email in os.getenv("PERF_ADMIN_EMAILS", "").split(',') if email.strip()
+}
+
+def is_perf_admin(user) -> bool:
+    """
+    Check whether a user may see the performance panel.
+    
+    Args:
+        user: Supabase user (or None)
+    
+    Returns:
+        bool: True if the panel should be shown
+    """
+    if '*' in PERF_ADMIN_EMAILS:
+        return True
+    email = getattr(user, 'email', None)
+    return bool(email) and email.lower() in PERF_ADMIN_EMAILS
+
+def plotly_chart(fig, **kwargs):
+    """
+    st.plotly_chart, timed as a 'render.chart' stage.
+    """
+    with stage('render.chart'):
+        st.plotly_chart(fig, **kwargs)
+
+def dataframe(frame, **kwargs):
+    """
+    st.dataframe, timed as a 'render.table' stage with the frame's size.
+    """
+    with stage('render.table', rows=len(frame), payload_bytes=frame_bytes(frame)):
+        st.dataframe(frame, **kwargs)
+
+def show_perf_panel(user=None):
+    """
+    Finish the current trace and, for admins, show it in the sidebar.
+    Call at the very end of a page.
+    
+    Args:
+        user: Current Supabase user
+    """
+    trace = finish_trace()
+    if not PERF_ENABLED or trace is None or not is_perf_admin(user):
+        return
+    
+    with st.sidebar.expander("⏱️ Performance"):
+        st.caption(f"This run: {trace.seconds * 1000:,.0f} ms")
+        
+        if trace.stages:
+            stages = pd.DataFrame([{
+                'Stage': timing.name,
+                'ms': round(timing.seconds * 1000, 1),
+                'Rows': timing.rows,
+                'KB': None if timing.payload_bytes is None else round(timing.payload_bytes / 1024, 1),
+            } for timing in trace.stages])
+            st.dataframe(stages, use_container_width=True, hide_index=True)
+        
+        totals = stage_totals()
+        if totals:
+            st.caption("Since server start")
+            summary = pd.DataFrame([{
+                'Stage': name,
+                'Calls': values['calls'],
+                'Avg ms': round(values['seconds'] / values['calls'] * 1000, 1),
+                'Max ms': round(values['max_seconds'] * 1000, 1),
+            } for name, values in sorted(totals.items(), key=lambda item: -item[1]['seconds'])])
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+        
+        memory = get_memory_report()
+        if memory:
+            st.caption(
+                f"Last full load: {memory['rows']:,} products, "
+                f"{memory['raw_bytes'] / 1e6:.1f} MB raw -> {memory['normalized_bytes'] / 1e6:.1f} MB normalized"
+            )
+        
+        requests = request_stats()
+        if requests:
+            st.caption(f"Supabase requests (circuit {supabase_breaker.state})")
+            latency = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+            summary = pd.DataFrame([{
+                'Operation': operation,
+                'Requests': values['requests'],
+                'Retries': values['retries'],
+                'Failed': values['failures'],
+                'p50 ms': latency(values['p50_seconds']),
+                'p95 ms': latency(values['p95_seconds']),
+                'Max ms': latency(values['max_seconds']),
+            } for operation, values in sorted(requests.items())])
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+        
+        flights = single_flight_stats()
+        if any(counters['calls'] for counters in flights.values()):
+            st.caption("Coalesced loads (callers served by another caller's request)")
+            coalescing = pd.DataFrame([{
+                'Group': name,
+                'Loads': counters['calls'],
+                'Coalesced': counters['coalesced'],
+                'Timeouts': counters['timeouts'],
+                'Errors': counters['errors'],
+            } for name, counters in sorted(flights.items())])
+            st.dataframe(coalescing, use_container_width=True, hide_index=True)
+        
+        st.download_button(
+            label="📥 Download traces (JSONL)",
+            data=export_traces(),
+            file_name="perf_traces.jsonl",
+            mime="application/x-ndjson",
+            use_container_width=True
+        )
@@ -0,0 +1,45 @@
+"""
+Price parsing utilities for CLP price strings.
+"""
+import pandas as pd
+
+# Integer part of a CLP price: digits with optional '.' thousands separators.
+# Anything after the decimal comma (e.g. ',00') is not captured.
+_INTEGER_PART = r'(\d[\d.]*)'
+
+def parse_clp_prices(prices):
+    """
+    Parse CLP price strings to whole pesos, vectorized.
+    
+    Examples:
+        $148.900,00 -> 148900
+        $12.990 -> 12990
+        7490 -> 7490
+        None / unparseable -> <NA>
+    
+    Args:
+        prices: pandas.Series of price strings (or numbers)
+    
+    Returns:
+        pandas.Series: Nullable Int64 prices, aligned with the input index
+    """
+    if pd.api.types.is_numeric_dtype(prices):
+        return pd.to_numeric(prices, errors='coerce').round().astype('Int64')
+    
+    integer_part = prices.astype('string').str.extract(_INTEGER_PART, expand=False)
+    digits = integer_part.str.replace('.', '', regex=False)
+    return pd.to_numeric(digits, errors='coerce').astype('Int64')
+
+def add_price_numeric(frame):
+    """
+    Add a parsed 'price_numeric' column next to 'price'.
+    
+    Args:
+        frame: Product DataFrame
+    
+    Returns:
+        pandas.DataFrame: The same frame, with 'price_numeric' when 'price' exists
+    """
+    if 'price' in frame.columns:
+        frame['price_numeric'] = parse_clp_prices(frame['price'])
+    return frame
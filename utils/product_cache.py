@@ -0,0 +1,416 @@
+"""
+Process-wide product cache shared across sessions and pages.
+
+Streamlit re-executes page scripts on every interaction, but imported modules
+stay loaded for the lifetime of the server process, so a module-level cache
+is shared by every session and page.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from utils.single_flight import DEFAULT_TIMEOUT_SECONDS, SingleFlight
+
+DEFAULT_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300"))
+
+# Versions are drawn from one process-wide sequence so they are unique across caches
+_last_version = 0
+_version_lock = threading.Lock()
+
+def next_version() -> int:
+    """
+    Draw the next dataset version.
+    
+    Returns:
+        int: A version greater than any issued or reserved so far
+    """
+    global _last_version
+    with _version_lock:
+        _last_version += 1
+        return _last_version
+
+def reserve_versions_through(version: int):
+    """
+    Make sure future versions are greater than a given one, e.g. one
+    restored from an on-disk snapshot written by a previous process.
+    
+    Args:
+        version: Highest version already in use
+    """
+    global _last_version
+    with _version_lock:
+        _last_version = max(_last_version, version)
+
+@dataclass(frozen=True)
+class CachedDataset:
+    """
+    An immutable snapshot of the product table.
+    
+    Attributes:
+        frame: Product DataFrame. Shared by all sessions - treat as read-only.
+        version: Process-wide monotonic dataset version, bumped whenever a
+            load produces a new frame.
+        loaded_at: Unix timestamp of the load.
+    """
+    frame: pd.DataFrame
+    version: int
+    loaded_at: float
+    
+    def age(self) -> float:
+        """Seconds elapsed since this snapshot was loaded."""
+        return time.time() - self.loaded_at
+
+# Blocking loads of caches created without their own flight group
+_cache_loads = SingleFlight('cache.load')
+
+class ProductCache:
+    """
+    TTL cache with stale-while-revalidate semantics.
+    
+    The first call blocks on the loader, unless a previously persisted
+    dataset can be restored; that one is served immediately and revalidated
+    in the background. After the TTL expires, callers keep receiving the
+    last good dataset while a single background thread reloads it and swaps
+    the new snapshot in. If a blocking reload fails, the last good dataset is
+    served as well (marked stale, so it keeps being revalidated).
+    """
+    
+    def __init__(
+        self,
+        loader: Callable[[], pd.DataFrame],
+        ttl: float = DEFAULT_TTL_SECONDS,
+        restore: Optional[Callable[[], Optional[CachedDataset]]] = None,
+        on_store: Optional[Callable[[CachedDataset], None]] = None,
+        flight: Optional[SingleFlight] = None,
+        flight_key=None,
+    ):
+        """
+        Args:
+            loader: Callable returning a fresh product DataFrame
+            ttl: Seconds before a cached dataset is considered stale
+            restore: Optional callable returning a persisted dataset (or None),
+                tried once before the first blocking load
+            on_store: Optional callback receiving every newly loaded dataset
+            flight: Flight group coalescing blocking loads (and counting them)
+            flight_key: Key of this cache's loads in the flight group
+        """
+        self._loader = loader
+        self.ttl = ttl
+        self._restore = restore
+        self._on_store = on_store
+        self._entry: Optional[CachedDataset] = None
+        # Kept through hard invalidations, served if a reload fails
+        self._last_good: Optional[CachedDataset] = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._flight = flight or _cache_loads
+        self._flight_key = flight_key if flight_key is not None else id(self)
+        self.last_error: Optional[Exception] = None
+    
+    def get(self, timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS) -> CachedDataset:
+        """
+        Get the cached dataset, loading or revalidating as needed.
+        
+        Args:
+            timeout: Seconds to wait for a first load started by another caller
+        
+        Returns:
+            CachedDataset: Current (possibly stale) product snapshot
+        """
+        with self._lock:
+            entry = self._entry
+            if entry is not None and self._is_stale(entry) and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._background_refresh, daemon=True).start()
+        
+        if entry is None:
+            # Concurrent first calls share one restore-or-load
+            return self._flight.do(self._flight_key, self._load_cold, timeout=timeout)
+        return entry
+    
+    def refresh(self, timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS, force: bool = False) -> CachedDataset:
+        """
+        Reload the dataset synchronously if it is stale (or with force, even
+        if it is fresh) and replace the cached snapshot.
+        
+        Concurrent callers join the in-progress load and share its result,
+        or its error, instead of starting (or retrying) their own.
+        
+        Args:
+            timeout: Seconds to wait for a load started by another caller
+            force: Reload even if the cached snapshot is still fresh
+        
+        Returns:
+            CachedDataset: The reloaded snapshot, or the cached one if it
+                was fresh and force is False
+        
+        Raises:
+            SingleFlightTimeout: If the other caller's load took too long
+        """
+        return self._flight.do(self._flight_key, lambda: self._load(force=force), timeout=timeout)
+    
+    def _load_cold(self) -> CachedDataset:
+        if self._restore_once() is not None:
+            # Serve the restored copy and revalidate it in the background
+            return self.get()
+        return self._load()
+    
+    def _load(self, force: bool = False) -> CachedDataset:
+        with self._load_lock:
+            with self._lock:
+                entry = self._entry
+            # Another caller finished a load while we were waiting on the lock
+            if not force and entry is not None and not self._is_stale(entry):
+                return entry
+            
+            try:
+                frame = self._loader()
+            except Exception as e:
+                self.last_error = e
+                last_good = self._last_good
+                if last_good is None:
+                    raise
+                # Backend degraded: fall back to the last good dataset (even
+                # after a hard invalidation) and keep revalidating it
+                print(f"Error loading products, serving the last good copy: {e}")
+                with self._lock:
+                    self._entry = last_good
+                    self._stale = True
+                return last_good
+            return self._store(frame)
+    
+    def update(self, apply: Callable[[], pd.DataFrame]) -> Optional[CachedDataset]:
+        """
+        Swap in a frame produced outside the loader, e.g. from pushed change
+        events. Runs under the load lock, so it never interleaves with a
+        reload. The load time (and so the TTL) of the current dataset is kept,
+        and on_store is not called: updates can arrive every second, and a
+        persisted copy catches up on them with its next delta sync.
+        
+        Args:
+            apply: Callable returning the updated frame (the current frame
+                object if nothing changed)
+        
+        Returns:
+            CachedDataset or None: The new snapshot, or None if nothing is
+                loaded yet (the first load will include the change anyway)
+        """
+        with self._load_lock:
+            with self._lock:
+                entry = self._entry
+            if entry is None:
+                return None
+            
+            return self._store(apply(), loaded_at=entry.loaded_at, notify=False)
+    
+    def invalidate(self, hard: bool = False):
+        """
+        Mark the cached dataset as outdated.
+        
+        Args:
+            hard: If True, drop the snapshot so the next call blocks on a reload.
+                Otherwise keep serving it while a background refresh runs.
+        """
+        with self._lock:
+            if hard:
+                self._entry = None
+            self._stale = True
+    
+    @property
+    def version(self) -> int:
+        """Version of the currently cached dataset (0 if nothing is loaded)."""
+        entry = self._entry
+        return entry.version if entry is not None else 0
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether a dataset (fresh or stale) is available without blocking."""
+        return self._entry is not None
+    
+    def _is_stale(self, entry: CachedDataset) -> bool:
+        return self._stale or entry.age() >= self.ttl
+    
+    def _restore_once(self) -> Optional[CachedDataset]:
+        with self._load_lock:
+            restore, self._restore = self._restore, None
+            if restore is None or self._entry is not None:
+                return None
+            
+            try:
+                restored = restore()
+            except Exception as e:
+                print(f"Error restoring product cache: {e}")
+                return None
+            if restored is None:
+                return None
+            
+            reserve_versions_through(restored.version)
+            with self._lock:
+                self._entry = restored
+                self._last_good = restored
+                self._stale = True
+            return restored
+    
+    def _store(self, frame: pd.DataFrame, loaded_at: Optional[float] = None, notify: bool = True) -> CachedDataset:
+        with self._lock:
+            # Loaders return the same frame object when nothing changed;
+            # keep the version so anything memoized against it stays valid
+            changed = self._entry is None or frame is not self._entry.frame
+            version = next_version() if changed else self._entry.version
+            if loaded_at is None:
+                loaded_at = time.time()
+                self._stale = False
+            self._entry = CachedDataset(frame=frame, version=version, loaded_at=loaded_at)
+            self._last_good = self._entry
+            self.last_error = None
+            entry = self._entry
+        
+        if changed and notify and self._on_store is not None:
+            try:
+                self._on_store(entry)
+            except Exception as e:
+                print(f"Error in product cache store callback: {e}")
+        return entry
+    
+    def _background_refresh(self):
+        try:
+            with self._load_lock:
+                frame = self._loader()
+                self._store(frame)
+        except Exception as e:
+            # Keep serving the last good copy; the next stale read retries
+            print(f"Error refreshing product cache: {e}")
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+ProjectionKey = Optional[frozenset]
+
+class ProjectionCache:
+    """
+    Product caches keyed by column projection.
+    
+    A request is served from any loaded cache holding a superset of its
+    columns, so a page asking for a few fields reuses a wider frame another
+    page already loaded instead of downloading its own copy.
+    """
+    
+    def __init__(
+        self,
+        cache_factory: Callable[[ProjectionKey], ProductCache],
+        required_columns: Iterable[str] = (),
+        derived_columns: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Args:
+            cache_factory: Called with a projection key (None for all columns)
+                and returning the ProductCache for that projection
+            required_columns: Columns added to every projection
+            derived_columns: Columns computed by the loader, mapped to their
+                source column; kept in a projection whenever the source is
+        """
+        self._cache_factory = cache_factory
+        self.required_columns = frozenset(required_columns)
+        self.derived_columns = derived_columns or {}
+        self._caches: Dict[ProjectionKey, ProductCache] = {}
+        # Last projection sliced from a wider frame: key -> (source version, dataset)
+        self._projected: Dict[ProjectionKey, Tuple[int, CachedDataset]] = {}
+        self._lock = threading.Lock()
+    
+    def key(self, columns: Optional[Iterable[str]] = None) -> ProjectionKey:
+        """
+        Normalize a column list into a projection key.
+        
+        Args:
+            columns: Columns to fetch, or None for all columns
+        
+        Returns:
+            frozenset or None: Projection key
+        """
+        if columns is None:
+            return None
+        return frozenset(columns) | self.required_columns
+    
+    def get(self, columns: Optional[Iterable[str]] = None) -> CachedDataset:
+        """
+        Get the cached dataset for a column projection.
+        
+        Args:
+            columns: Columns needed by the caller, or None for all columns
+        
+        Returns:
+            CachedDataset: Snapshot holding (at least) the requested columns
+        """
+        key = self.key(columns)
+        source = None
+        
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is None or not cache.loaded:
+                source_key = self._find_wider(key)
+                if source_key is not None:
+                    source = self._caches[source_key]
+                elif cache is None:
+                    cache = self._cache_factory(key)
+                    self._caches[key] = cache
+        
+        if source is None:
+            return cache.get()
+        return self._project(key, source.get())
+    
+    def invalidate(self, hard: bool = False):
+        """
+        Invalidate every cached projection.
+        
+        Args:
+            hard: If True, drop the snapshots so the next calls block on a reload
+        """
+        with self._lock:
+            caches = list(self._caches.values())
+            if hard:
+                self._projected.clear()
+        for cache in caches:
+            cache.invalidate(hard=hard)
+    
+    def _find_wider(self, key: ProjectionKey) -> ProjectionKey:
+        """
+        Find a loaded cache whose projection covers the requested one.
+        Prefers the narrowest match to keep slicing cheap.
+        """
+        candidates = []
+        for other_key, cache in self._caches.items():
+            if other_key == key or not cache.loaded:
+                continue
+            if other_key is None:
+                candidates.append((float('inf'), other_key))
+            elif key is not None and key <= other_key:
+                candidates.append((len(other_key), other_key))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: candidate[0])[1]
+    
+    def _project(self, key: ProjectionKey, source: CachedDataset) -> CachedDataset:
+        """
+        Slice a wider snapshot down to a projection, memoized per source version.
+        """
+        with self._lock:
+            memo = self._projected.get(key)
+            if memo is not None and memo[0] == source.version:
+                return memo[1]
+        
+        columns = [
+            column for column in source.frame.columns
+            if column in key or self.derived_columns.get(column) in key
+        ]
+        dataset = CachedDataset(frame=source.frame[columns], version=source.version, loaded_at=source.loaded_at)
+        
+        with self._lock:
+            self._projected[key] = (source.version, dataset)
+        return dataset
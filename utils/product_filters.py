@@ -0,0 +1,108 @@
+"""
+Catalog filters as boolean masks over the shared product frame.
+
+Each predicate (marketplace, stock status, search query) is evaluated at
+most once per dataset version into a read-only mask, shared by every
+session. A filter combines the masks of its predicates, so no rows are
+copied until the visible page is materialized (see utils.table_paging).
+"""
+import threading
+
+import numpy as np
+
+from utils.search_index import get_search_index, tokenize
+
+# Predicate masks per (dataset version, column, value), oldest evicted first
+_MASK_CACHE_SIZE = 32
+_mask_cache = {}
+# (dataset version, sorted marketplace names)
+_marketplaces = None
+_mask_lock = threading.Lock()
+
+def _evaluate(dataset, column, value):
+    frame = dataset.frame
+    if column == 'search':
+        matching_ids = get_search_index(dataset).search(' '.join(value))
+        return frame['id'].isin(list(matching_ids)).to_numpy(dtype=bool)
+    if column == 'in_stock':
+        return frame['in_stock'].eq(value).fillna(False).to_numpy(dtype=bool)
+    return (frame[column] == value).to_numpy(dtype=bool)
+
+def get_mask(dataset, column, value):
+    """
+    Get the rows of a cached dataset matching one predicate, computed at
+    most once per dataset version.
+    
+    Args:
+        dataset: CachedDataset from utils.data_fetcher
+        column: Column to compare, or 'search' for a name search
+        value: Value to match, or the search words
+    
+    Returns:
+        numpy.ndarray: Boolean mask over dataset.frame (read-only)
+    """
+    key = (dataset.version, column, value)
+    
+    with _mask_lock:
+        mask = _mask_cache.get(key)
+    if mask is not None:
+        return mask
+    
+    mask = _evaluate(dataset, column, value)
+    mask.flags.writeable = False
+    
+    with _mask_lock:
+        _mask_cache[key] = mask
+        while len(_mask_cache) > _MASK_CACHE_SIZE:
+            del _mask_cache[next(iter(_mask_cache))]
+    return mask
+
+def filter_mask(dataset, marketplace=None, in_stock=None, search=''):
+    """
+    Combine the catalog filters into one mask.
+    
+    Args:
+        dataset: CachedDataset from utils.data_fetcher
+        marketplace: Only products from this marketplace (None for all)
+        in_stock: Only products with this stock status (None for all)
+        search: Words that must all prefix a word of the name, ignoring
+            case and accents (empty for all)
+    
+    Returns:
+        numpy.ndarray or None: Boolean mask over dataset.frame (read-only),
+            or None when no filter is active
+    """
+    predicates = []
+    if marketplace is not None:
+        predicates.append(('marketplace', marketplace))
+    if in_stock is not None:
+        predicates.append(('in_stock', in_stock))
+    # Normalized, so 'Sobre ' and 'sobre' share one cached mask
+    words = tuple(tokenize(search or ''))
+    if words:
+        predicates.append(('search', words))
+    
+    masks = [get_mask(dataset, column, value) for column, value in predicates]
+    if not masks:
+        return None
+    if len(masks) == 1:
+        return masks[0]
+    return np.logical_and.reduce(masks)
+
+def get_marketplaces(dataset):
+    """
+    Get the marketplaces present in a cached dataset, sorted, computed at
+    most once per dataset version.
+    
+    Returns:
+        list: Marketplace names
+    """
+    global _marketplaces
+
+    cached = _marketplaces
+    if cached is not None and cached[0] == dataset.version:
+        return cached[1]
+
+    marketplaces = sorted(dataset.frame['marketplace'].dropna().unique().tolist())
+    _marketplaces = (dataset.version, marketplaces)
+    return marketplaces
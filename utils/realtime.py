@@ -0,0 +1,241 @@
+"""
+Push-based product cache updates from Supabase Realtime change events.
+
+When enabled, one subscriber per process listens to INSERT/UPDATE/DELETE on
+the products table and applies them to the shared product frames, so
+scraper writes show up within seconds instead of after the cache TTL.
+Requires Realtime to be enabled for the products table in Supabase
+(Database > Replication).
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from realtime import AsyncRealtimeClient
+
+from utils.async_data import run_async
+from utils.data_fetcher import apply_product_changes
+from utils.server_aggregates import invalidate_server_marketplace_stats
+from utils.supabase_client import get_supabase_credentials
+
+REALTIME_ENABLED = os.getenv("PRODUCT_REALTIME", "false").lower() == "true"
+REALTIME_BATCH_SECONDS = float(os.getenv("PRODUCT_REALTIME_BATCH_SECONDS", "1"))
+
+@dataclass(frozen=True)
+class ProductChange:
+    """
+    One row change.
+    
+    Attributes:
+        type: 'INSERT', 'UPDATE' or 'DELETE'
+        record: New row (None for deletes)
+        old_record: Previous row; for deletes, at least the primary key
+    """
+    type: str
+    record: Optional[dict]
+    old_record: Optional[dict]
+    
+    @property
+    def id(self):
+        row = self.old_record if self.type == 'DELETE' else self.record
+        return (row or {}).get('id')
+
+def parse_change(payload) -> Optional[ProductChange]:
+    """
+    Read a Realtime postgres_changes payload.
+    
+    Args:
+        payload: Callback payload ({'data': {...}, 'ids': [...]})
+    
+    Returns:
+        ProductChange or None: The change, or None for other event types
+    """
+    data = payload.get('data', payload)
+    change_type = str(getattr(data.get('type'), 'value', data.get('type'))).upper()
+    if change_type not in ('INSERT', 'UPDATE', 'DELETE'):
+        return None
+    return ProductChange(type=change_type, record=data.get('record'), old_record=data.get('old_record'))
+
+class SupabaseChangeSource:
+    """
+    Postgres change events of one table over a Supabase Realtime websocket,
+    running on the shared async loop (see utils.async_data).
+    """
+    
+    def __init__(self, table='products', schema='public'):
+        self.table = table
+        self.schema = schema
+        self._client = None
+    
+    def start(self, callback: Callable[[dict], None]):
+        """
+        Connect and deliver every change payload to callback.
+        """
+        run_async(self._subscribe(callback))
+    
+    def stop(self):
+        """
+        Close the websocket.
+        """
+        client, self._client = self._client, None
+        if client is not None:
+            run_async(client.close())
+    
+    async def _subscribe(self, callback):
+        supabase_url, supabase_key = get_supabase_credentials()
+        self._client = AsyncRealtimeClient(f"{supabase_url.rstrip('/')}/realtime/v1", token=supabase_key)
+        channel = self._client.channel(f'{self.schema}:{self.table}')
+        channel.on_postgres_changes('*', callback, table=self.table, schema=self.schema)
+        await channel.subscribe()
+
+class RealtimeSubscriber:
+    """
+    Applies change events to the product cache in small batches.
+    
+    Events arriving within the batch window are coalesced per product id
+    (the last change wins) and applied together, so a burst of scraper
+    writes costs one frame update and one version bump instead of one each.
+    """
+    
+    def __init__(self, source, apply=apply_product_changes, batch_seconds=REALTIME_BATCH_SECONDS):
+        """
+        Args:
+            source: Event source with start(callback) and stop()
+            apply: Called with (records, deleted_ids) for every batch
+            batch_seconds: Seconds to collect events before applying them
+        """
+        self.source = source
+        self.batch_seconds = batch_seconds
+        self._apply = apply
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self.events_received = 0
+        self.batches_applied = 0
+        self.last_error: Optional[Exception] = None
+    
+    def start(self):
+        """
+        Subscribe to the source and start the apply thread.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='product-realtime', daemon=True)
+        self._thread.start()
+        try:
+            self.source.start(self.on_event)
+        except Exception:
+            self._running = False
+            self._wakeup.set()
+            raise
+    
+    def stop(self):
+        """
+        Unsubscribe and apply whatever is still pending.
+        """
+        self._running = False
+        self._wakeup.set()
+        self.source.stop()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+    
+    def on_event(self, payload):
+        """
+        Queue one change payload (called by the event source).
+        """
+        change = parse_change(payload)
+        if change is None or change.id is None:
+            return
+        with self._lock:
+            self._pending.append(change)
+            self.events_received += 1
+        self._wakeup.set()
+    
+    def flush(self) -> int:
+        """
+        Apply every queued change now.
+        
+        Returns:
+            int: Number of product ids changed
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        
+        latest = {}
+        for change in pending:
+            latest[change.id] = change
+        records = [change.record for change in latest.values() if change.type != 'DELETE']
+        deleted_ids = [product_id for product_id, change in latest.items() if change.type == 'DELETE']
+        
+        self._apply(records, deleted_ids)
+        invalidate_server_marketplace_stats()
+        self.batches_applied += 1
+        return len(latest)
+    
+    def _run(self):
+        while self._running:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._running:
+                break
+            # Let a burst of writes accumulate into one batch
+            time.sleep(self.batch_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                # Drop the batch; TTL delta syncs catch up on writes, full syncs on deletes
+                print(f"Error applying realtime product changes: {e}")
+                self.last_error = e
+
+# Seconds to wait before retrying a subscription that failed to connect
+_RETRY_SECONDS = 60
+
+_subscriber: Optional[RealtimeSubscriber] = None
+_failed_at = 0.0
+_subscriber_lock = threading.Lock()
+
+def start_realtime_updates(source=None) -> Optional[RealtimeSubscriber]:
+    """
+    Start the process-wide realtime subscriber (once; later calls return it).
+    Safe to call on every script run.
+    
+    Args:
+        source: Event source, defaults to Supabase Realtime on the products table
+    
+    Returns:
+        RealtimeSubscriber or None: The running subscriber, or None if it
+            could not connect (retried after a minute; the cache keeps
+            polling meanwhile)
+    """
+    global _subscriber, _failed_at
+    
+    with _subscriber_lock:
+        if _subscriber is None and time.time() - _failed_at >= _RETRY_SECONDS:
+            subscriber = RealtimeSubscriber(source or SupabaseChangeSource())
+            try:
+                subscriber.start()
+            except Exception as e:
+                print(f"Error subscribing to realtime product changes: {e}")
+                _failed_at = time.time()
+                return None
+            _subscriber = subscriber
+        return _subscriber
+
+def stop_realtime_updates():
+    """
+    Stop the process-wide realtime subscriber, if running.
+    """
+    global _subscriber
+    
+    with _subscriber_lock:
+        subscriber, _subscriber = _subscriber, None
+    if subscriber is not None:
+        subscriber.stop()
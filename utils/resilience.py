@@ -0,0 +1,268 @@
+"""
+Retries and a circuit breaker for Supabase requests.
+
+Transient failures (network errors, timeouts, 5xx and 429 responses) are
+retried with jittered exponential backoff, so one costs a page instead of a
+whole table scan. When requests keep failing, the circuit breaker opens:
+further requests fail immediately (no load is put on a struggling backend,
+no session waits on timeouts) and callers fall back to the last good data
+until a trial request succeeds. Errors in the request itself, like an
+unknown column, are raised straight away and don't count as failures.
+"""
+import asyncio
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+
+FETCH_RETRIES = int(os.getenv("PRODUCT_FETCH_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = float(os.getenv("PRODUCT_FETCH_BACKOFF_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("PRODUCT_FETCH_BACKOFF_MAX_SECONDS", "8"))
+BREAKER_FAILURES = int(os.getenv("SUPABASE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30"))
+
+# Latencies kept per operation for the percentiles
+_LATENCY_SAMPLES = 500
+
+# PostgREST errors raised while it can't reach or is waiting on the database
+_TRANSIENT_POSTGREST_CODES = {'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'}
+# SQLSTATE classes and codes of failures that may pass on their own: connection
+# exceptions, insufficient resources, serialization failures and deadlocks,
+# statement timeouts and server shutdowns
+_TRANSIENT_SQLSTATE_CLASSES = ('08', '53')
+_TRANSIENT_SQLSTATES = {'40001', '40P01', '57014', '57P01', '57P02', '57P03'}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; once `reset_seconds`
+    have passed, lets a single trial request through (half-open) and closes
+    again if it succeeds.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 reset_seconds: float = BREAKER_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half-open'."""
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if self.clock() - self.opened_at >= self.reset_seconds:
+                return 'half-open'
+            return 'open'
+    
+    def before_request(self):
+        """
+        Check that a request may be sent.
+        
+        Raises:
+            CircuitOpenError: While the breaker is open, or while another
+                trial request is running in the half-open state
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.clock() - self.opened_at >= self.reset_seconds and not self._trial_running:
+                self._trial_running = True
+                return
+        raise CircuitOpenError(f"{self.name} is unavailable; requests are paused after repeated failures")
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    self.times_opened += 1
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+supabase_breaker = CircuitBreaker('Supabase')
+
+# Per operation: requests, retries, failures and recent latencies
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(operation, latency=None, retry=False, failure=False):
+    with _stats_lock:
+        stats = _stats.setdefault(operation, {
+            'requests': 0, 'retries': 0, 'failures': 0, 'latencies': deque(maxlen=_LATENCY_SAMPLES),
+        })
+        stats['requests'] += 1
+        stats['retries'] += retry
+        stats['failures'] += failure
+        if latency is not None:
+            stats['latencies'].append(latency)
+
+def _transient_status(status) -> bool:
+    return status == 429 or status >= 500
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed request may succeed if sent again.
+    
+    Args:
+        error: Exception raised by the request
+    
+    Returns:
+        bool: True for network errors, timeouts, 5xx and 429 responses and
+            database errors that pass on their own; False for errors in the
+            request itself (bad column, bad range, missing view, ...)
+    """
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return _transient_status(error.response.status_code)
+    if isinstance(error, APIError):
+        if isinstance(error.code, int):
+            # No JSON error body: the code is the HTTP status (e.g. a gateway error page)
+            return _transient_status(error.code)
+        code = error.code or ''
+        return code in _TRANSIENT_POSTGREST_CODES or code in _TRANSIENT_SQLSTATES \
+            or code.startswith(_TRANSIENT_SQLSTATE_CLASSES)
+    return False
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): a random
+    duration up to base * 2^attempt, capped ("full jitter"), so sessions
+    retrying together don't hit the backend in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def call_with_retry(request: Callable, operation: str, retries: int = FETCH_RETRIES,
+                    breaker: Optional[CircuitBreaker] = supabase_breaker, sleep: Callable[[float], None] = time.sleep):
+    """
+    Send a request, retrying transient failures with jittered exponential
+    backoff. Other errors are raised at once; the backend answered, so they
+    count as a success for the circuit breaker.
+    
+    Args:
+        request: Callable sending the request and returning its response
+        operation: Name the attempts are counted under
+        retries: Retries after the first attempt
+        breaker: Circuit breaker guarding the backend (None for none)
+        sleep: Sleep function, replaceable for testing
+    
+    Returns:
+        The response of the first successful attempt
+    
+    Raises:
+        CircuitOpenError: If the breaker is (or becomes) open
+        Exception: A non-transient error, or the last attempt's error once
+            the retries are used up
+    """
+    for attempt in range(retries + 1):
+        if breaker is not None:
+            breaker.before_request()
+        started = time.perf_counter()
+        try:
+            response = request()
+        except Exception as e:
+            if not _should_retry(e, attempt, retries, operation, breaker):
+                raise
+            sleep(backoff_delay(attempt))
+            continue
+        _record_success(operation, breaker, started)
+        return response
+
+async def call_with_retry_async(request: Callable, operation: str, retries: int = FETCH_RETRIES,
+                                breaker: Optional[CircuitBreaker] = supabase_breaker):
+    """
+    Async counterpart of call_with_retry.
+    
+    Args:
+        request: Callable returning an awaitable of the response (e.g. the
+            execute method of an async query)
+        operation: Name the attempts are counted under
+        retries: Retries after the first attempt
+        breaker: Circuit breaker guarding the backend (None for none)
+    
+    Returns:
+        The response of the first successful attempt
+    """
+    for attempt in range(retries + 1):
+        if breaker is not None:
+            breaker.before_request()
+        started = time.perf_counter()
+        try:
+            response = await request()
+        except Exception as e:
+            if not _should_retry(e, attempt, retries, operation, breaker):
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        _record_success(operation, breaker, started)
+        return response
+
+def _should_retry(error, attempt, retries, operation, breaker) -> bool:
+    """
+    Record a failed attempt and decide whether to send it again.
+    """
+    if not is_transient(error):
+        if breaker is not None:
+            breaker.record_success()
+        _record(operation, failure=True)
+        return False
+    
+    if breaker is not None:
+        breaker.record_failure()
+    last_attempt = attempt == retries
+    _record(operation, retry=not last_attempt, failure=last_attempt)
+    return not last_attempt
+
+def _record_success(operation, breaker, started):
+    if breaker is not None:
+        breaker.record_success()
+    _record(operation, latency=time.perf_counter() - started)
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def request_stats() -> dict:
+    """
+    Get retry and latency statistics of every operation.
+    
+    Returns:
+        dict: Operation -> requests (attempts), retries, failures (requests
+            that failed after all retries) and p50/p95/max latency in
+            seconds of recent successful attempts (None if none yet)
+    """
+    with _stats_lock:
+        snapshot = {operation: dict(stats, latencies=list(stats['latencies'])) for operation, stats in _stats.items()}
+    
+    result = {}
+    for operation, stats in snapshot.items():
+        latencies = stats.pop('latencies')
+        result[operation] = {
+            **stats,
+            'p50_seconds': statistics.median(latencies) if latencies else None,
+            'p95_seconds': _percentile(latencies, 0.95) if latencies else None,
+            'max_seconds': max(latencies) if latencies else None,
+        }
+    return result
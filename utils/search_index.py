@@ -0,0 +1,215 @@
+"""
+Inverted token index for multi-word product name search.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+_TOKEN = re.compile(r'\w+')
+# Combining diacritical marks left over after NFKD decomposition
+_COMBINING_MARKS = '[\u0300-\u036f]'
+
+def fold(text):
+    """
+    Lowercase text and strip accents, so "Edición" matches "edicion".
+    
+    Args:
+        text: Text to fold
+    
+    Returns:
+        str: Folded text
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def tokenize(text):
+    """
+    Split text into folded word tokens.
+    
+    Args:
+        text: Text to tokenize (None / NA yields no tokens)
+    
+    Returns:
+        list: Tokens in order of appearance
+    """
+    if text is None or pd.isna(text):
+        return []
+    return _TOKEN.findall(fold(str(text)))
+
+def tokenize_series(texts):
+    """
+    Vectorized tokenize() for a whole column.
+    
+    Args:
+        texts: pandas.Series of text
+    
+    Returns:
+        pandas.Series: List of tokens per row (empty for missing text)
+    """
+    folded = texts.astype('string').str.lower()\
+        .str.normalize('NFKD')\
+        .str.replace(_COMBINING_MARKS, '', regex=True)
+    tokens = folded.str.findall(_TOKEN.pattern)
+    return tokens.where(tokens.notna(), pd.Series([[]] * len(tokens), index=tokens.index, dtype=object))
+
+class SearchIndex:
+    """
+    Token -> product id posting lists with prefix lookup.
+    
+    A query matches products whose name has, for every query word, a token
+    starting with that word (AND semantics), so "patr guer" finds
+    "Patrulla de guerra".
+    """
+    
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._tokens_by_id = {}
+        self._sorted_tokens = []
+        self._vocabulary_changed = False
+        self._lock = threading.RLock()
+    
+    def __len__(self):
+        return len(self._tokens_by_id)
+    
+    def add(self, ids, texts):
+        """
+        Index (or re-index) documents.
+        
+        Args:
+            ids: Product ids
+            texts: Text of each product, aligned with ids
+        """
+        token_lists = tokenize_series(pd.Series(list(texts), dtype=object))
+        
+        with self._lock:
+            for product_id, tokens in zip(ids, token_lists):
+                self._remove_one(product_id)
+                tokens = set(tokens)
+                self._tokens_by_id[product_id] = tokens
+                for token in tokens:
+                    postings = self._postings[token]
+                    if not postings:
+                        self._vocabulary_changed = True
+                    postings.add(product_id)
+    
+    def remove(self, ids):
+        """
+        Drop documents from the index.
+        
+        Args:
+            ids: Product ids to remove
+        """
+        with self._lock:
+            for product_id in ids:
+                self._remove_one(product_id)
+    
+    def search(self, query):
+        """
+        Find products matching every word of a query.
+        
+        Args:
+            query: Free-text query
+        
+        Returns:
+            set: Matching product ids (every indexed id for an empty query)
+        """
+        words = tokenize(query)
+        
+        with self._lock:
+            if not words:
+                return set(self._tokens_by_id)
+            
+            result = None
+            # Intersect the most selective words first
+            for matches in sorted((self._prefix_matches(word) for word in words), key=len):
+                result = matches if result is None else result & matches
+                if not result:
+                    break
+            return result
+    
+    def _prefix_matches(self, prefix):
+        """
+        Union of the posting lists of every token starting with prefix.
+        """
+        if self._vocabulary_changed:
+            self._sorted_tokens = sorted(self._postings)
+            self._vocabulary_changed = False
+        
+        matches = set()
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+        return matches
+    
+    def _remove_one(self, product_id):
+        for token in self._tokens_by_id.pop(product_id, ()):
+            postings = self._postings[token]
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary_changed = True
+
+def build_index(frame, text_column='name', id_column='id'):
+    """
+    Build a search index over a product frame.
+    
+    Args:
+        frame: Product DataFrame
+        text_column: Column to index
+        id_column: Column identifying each product
+    
+    Returns:
+        SearchIndex: Index over every row
+    """
+    index = SearchIndex()
+    index.add(frame[id_column].tolist(), frame[text_column].tolist())
+    return index
+
+# Process-wide name index, moved forward incrementally as datasets change
+_index = None
+_indexed_version = None
+_indexed_names = None
+_registry_lock = threading.Lock()
+
+def get_search_index(dataset):
+    """
+    Get the name search index for a cached product dataset.
+    
+    The index is shared by every session. When the dataset version changes,
+    only rows whose name changed are re-tokenized, and rows no longer present
+    are dropped.
+    
+    Args:
+        dataset: CachedDataset with 'id' and 'name' columns
+    
+    Returns:
+        SearchIndex: Index matching the dataset
+    """
+    global _index, _indexed_version, _indexed_names
+    
+    with _registry_lock:
+        if _index is not None and _indexed_version == dataset.version:
+            return _index
+        
+        frame = dataset.frame
+        names = pd.Series(frame['name'].to_numpy(), index=frame['id'].to_numpy())
+        names = names[~names.index.duplicated(keep='last')]
+        
+        if _index is None:
+            _index = build_index(frame)
+        else:
+            previous = names.index.to_series().map(_indexed_names)
+            changed = names[previous.ne(names).fillna(True).astype(bool)]
+            removed = _indexed_names.index.difference(names.index)
+            _index.remove(removed.tolist())
+            _index.add(changed.index.tolist(), changed.tolist())
+        
+        _indexed_version = dataset.version
+        _indexed_names = names
+        return _index
@@ -0,0 +1,178 @@
+"""
+Server-side aggregates: marketplace summary and price histogram computed by
+Postgres (sql/marketplace_stats.sql) instead of from the full product table.
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.aggregations import HISTOGRAM_BINS, MarketplaceStats
+from utils.async_data import get_async_client
+from utils.product_cache import DEFAULT_TTL_SECONDS
+from utils.resilience import call_with_retry, call_with_retry_async
+from utils.single_flight import SingleFlight
+from utils.supabase_client import get_supabase_client
+
+SERVER_AGGREGATES = os.getenv("PRODUCT_SERVER_AGGREGATES", "false").lower() == "true"
+
+STATS_COLUMNS = ['marketplace', 'products', 'in_stock', 'out_of_stock', 'priced', 'avg_price', 'min_price', 'max_price']
+
+def fetch_marketplace_stats(bins=HISTOGRAM_BINS, client=None):
+    """
+    Fetch the per-marketplace summary and price histogram from Supabase.
+    Transfers one row per marketplace plus one row per histogram bin.
+    
+    Args:
+        bins: Number of price histogram buckets
+        client: Supabase client (defaults to the shared client)
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    supabase = client or get_supabase_client()
+    
+    stats_query = supabase.table('marketplace_stats')\
+        .select(','.join(STATS_COLUMNS))
+    histogram_query = supabase.rpc('price_histogram', {'bins': bins})
+    # Only call_with_retry retries (see utils.data_fetcher._execute)
+    stats_response = call_with_retry(stats_query.retry(False).execute, 'supabase.stats')
+    histogram_response = call_with_retry(histogram_query.retry(False).execute, 'supabase.histogram')
+    
+    return build_marketplace_stats(stats_response.data, histogram_response.data)
+
+async def fetch_marketplace_stats_async(bins=HISTOGRAM_BINS):
+    """
+    Fetch the marketplace summary and price histogram concurrently over the
+    pooled async client (see utils.async_data).
+    
+    Args:
+        bins: Number of price histogram buckets
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    client = get_async_client()
+    stats_response, histogram_response = await asyncio.gather(
+        call_with_retry_async(client.from_('marketplace_stats').select(','.join(STATS_COLUMNS)).retry(False).execute, 'supabase.stats'),
+        call_with_retry_async(client.rpc('price_histogram', {'bins': bins}).retry(False).execute, 'supabase.histogram'),
+    )
+    return build_marketplace_stats(stats_response.data, histogram_response.data)
+
+def build_marketplace_stats(stats_rows, histogram_rows):
+    """
+    Build MarketplaceStats from marketplace_stats view rows and
+    price_histogram RPC rows.
+    
+    Args:
+        stats_rows: Rows of the marketplace_stats view
+        histogram_rows: Rows returned by the price_histogram RPC
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    by_marketplace = pd.DataFrame(stats_rows or [], columns=STATS_COLUMNS)
+    # Products without a marketplace count toward the total only
+    total_products = int(pd.to_numeric(by_marketplace['products']).fillna(0).sum())
+    by_marketplace = by_marketplace[by_marketplace['marketplace'].notna()].reset_index(drop=True)
+    for column in ['products', 'in_stock', 'out_of_stock', 'priced']:
+        by_marketplace[column] = pd.to_numeric(by_marketplace[column]).fillna(0).astype(int)
+    for column in ['avg_price', 'min_price', 'max_price']:
+        by_marketplace[column] = pd.to_numeric(by_marketplace[column]).astype(float)
+    by_marketplace = by_marketplace.sort_values('products', ascending=False, ignore_index=True)
+    
+    histogram = pd.DataFrame(histogram_rows or [], columns=['bin_start', 'bin_end', 'count'])
+    
+    return MarketplaceStats(
+        by_marketplace=by_marketplace,
+        price_histogram=histogram,
+        total_products=total_products,
+    )
+
+# Last fetched stats per bins: bins -> (fetched_at, stats)
+_server_stats = {}
+_server_stats_lock = threading.Lock()
+# Fetches in flight per bins, for the sync and the async path
+_server_stats_loads = SingleFlight('supabase.stats')
+_server_stats_tasks = {}
+
+def get_server_marketplace_stats(bins=HISTOGRAM_BINS, ttl=DEFAULT_TTL_SECONDS):
+    """
+    Get server-side marketplace statistics, cached for the product cache TTL.
+    If a fetch fails, the last fetched statistics are served instead.
+    
+    Args:
+        bins: Number of price histogram buckets
+        ttl: Seconds to reuse fetched stats
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    stats = _cached_server_stats(bins, ttl)
+    if stats is None:
+        # Concurrent callers share one fetch; the cache is checked again in
+        # case a fetch finished between the check above and joining the flight
+        try:
+            stats = _server_stats_loads.do(
+                bins,
+                lambda: _cached_server_stats(bins, ttl) or _store_server_stats(bins, fetch_marketplace_stats(bins=bins))
+            )
+        except Exception as e:
+            stats = _last_server_stats(bins, e)
+    return stats
+
+async def get_server_marketplace_stats_async(bins=HISTOGRAM_BINS, ttl=DEFAULT_TTL_SECONDS):
+    """
+    Async counterpart of get_server_marketplace_stats, sharing its cache.
+    
+    Returns:
+        MarketplaceStats: Aggregated statistics
+    """
+    stats = _cached_server_stats(bins, ttl)
+    if stats is None:
+        # Everything async runs on one loop, so concurrent callers can share a task
+        task = _server_stats_tasks.get(bins)
+        if task is None:
+            task = asyncio.ensure_future(fetch_marketplace_stats_async(bins=bins))
+            _server_stats_tasks[bins] = task
+            task.add_done_callback(lambda _: _server_stats_tasks.pop(bins, None))
+        try:
+            # Shielded, so one caller timing out doesn't cancel the others' fetch
+            stats = _store_server_stats(bins, await asyncio.shield(task))
+        except Exception as e:
+            stats = _last_server_stats(bins, e)
+    return stats
+
+def _cached_server_stats(bins, ttl):
+    with _server_stats_lock:
+        cached = _server_stats.get(bins)
+    if cached is not None and time.time() - cached[0] < ttl:
+        return cached[1]
+    return None
+
+def _store_server_stats(bins, stats):
+    with _server_stats_lock:
+        _server_stats[bins] = (time.time(), stats)
+    return stats
+
+def _last_server_stats(bins, error):
+    """
+    Get the last fetched stats after a failed fetch, or re-raise the error.
+    """
+    with _server_stats_lock:
+        cached = _server_stats.get(bins)
+    if cached is None:
+        raise error
+    print(f"Error fetching marketplace stats, serving the last fetched ones: {error}")
+    return cached[1]
+
+def invalidate_server_marketplace_stats():
+    """
+    Mark cached server-side statistics as expired so the next call refetches
+    them. They are kept to be served if that fetch fails.
+    """
+    with _server_stats_lock:
+        for bins, (_, stats) in list(_server_stats.items()):
+            _server_stats[bins] = (0.0, stats)
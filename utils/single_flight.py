@@ -0,0 +1,147 @@
+"""
+Single-flight request coalescing.
+
+When many sessions ask for the same thing at once (typically right after
+a server restart or a cache expiry), only the first caller runs the load;
+the others wait for it and share its result or its error, so Supabase sees
+one request no matter how many users are online.
+"""
+import functools
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "120"))
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a caller that gave up waiting for another caller's load."""
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent calls with the same
+    key wait for the running one and share its outcome.
+    """
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Name reported by single_flight_stats()
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0}
+        with _registry_lock:
+            _registry[name] = self
+    
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS):
+        """
+        Run fn, or wait for the call already running under the same key.
+        
+        Args:
+            key: What is being loaded, e.g. (query, projection)
+            fn: Callable producing the result
+            timeout: Seconds a waiting caller waits before giving up (None
+                to wait indefinitely). The caller running fn is not
+                interrupted; its own requests time out on their own.
+        
+        Returns:
+            The result of fn (shared by every caller of the same flight)
+        
+        Raises:
+            SingleFlightTimeout: If the running call didn't finish in time
+            Exception: Whatever fn raised, re-raised to every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['calls'] += 1
+            else:
+                call.waiters += 1
+                self._counters['coalesced'] += 1
+        
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                with self._lock:
+                    self._counters['errors'] += 1
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+        
+        if not call.done.wait(timeout):
+            with self._lock:
+                self._counters['timeouts'] += 1
+            raise SingleFlightTimeout(f"Timed out after {timeout:g}s waiting for {self.name} load {key!r}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+    
+    def stats(self) -> dict:
+        """
+        Get this flight group's counters.
+        
+        Returns:
+            dict: calls (loads actually run), coalesced (callers served by
+                another caller's load), timeouts, errors and in_flight
+        """
+        with self._lock:
+            return {**self._counters, 'in_flight': len(self._calls)}
+
+_registry: Dict[str, SingleFlight] = {}
+_registry_lock = threading.Lock()
+
+def single_flight_stats() -> Dict[str, dict]:
+    """
+    Get the counters of every flight group.
+    
+    Returns:
+        dict: Group name -> counters (see SingleFlight.stats)
+    """
+    with _registry_lock:
+        groups = list(_registry.values())
+    return {group.name: group.stats() for group in groups}
+
+def _freeze(value):
+    """
+    Turn lists, sets and dicts into hashable equivalents, for use in keys.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+def coalesced(flight: SingleFlight, timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS):
+    """
+    Decorator coalescing concurrent calls of a function made with the same
+    arguments. Every caller receives the same result object, so results
+    must be treated as read-only.
+    
+    Args:
+        flight: Flight group to run the calls in
+        timeout: Seconds a waiting caller waits (see SingleFlight.do)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, _freeze(args), _freeze(kwargs))
+            return flight.do(key, lambda: func(*args, **kwargs), timeout=timeout)
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+"""
+On-disk snapshots of the normalized product frame for fast cold starts.
+
+Snapshots are uncompressed Feather (Arrow IPC) files, memory-mapped when
+read, so restoring one costs a single conversion to pandas rather than a
+parse. The dataset version and delta sync watermark are stored in the
+file's schema metadata, so a snapshot is replaced with a single rename and
+its frame and watermark always match. pyarrow ships with Streamlit;
+without it, snapshots are silently disabled.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import pandas as pd
+
+SNAPSHOTS_ENABLED = os.getenv("PRODUCT_SNAPSHOTS", "true").lower() == "true"
+SNAPSHOT_DIR = os.getenv(
+    "PRODUCT_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.snapshots')
+)
+
+# Bumped when the snapshot layout changes; snapshots of other formats are ignored
+SNAPSHOT_FORMAT = 2
+# Schema metadata key holding the snapshot's JSON metadata
+_META_KEY = b'product_snapshot'
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    A product frame restored from disk.
+    
+    Attributes:
+        frame: Normalized product DataFrame
+        version: Dataset version the frame was cached under
+        watermark: Delta sync high-water mark (ISO timestamp) or None
+        saved_at: Unix timestamp of the write
+        last_full_sync: Unix timestamp of the last full reconciliation
+    """
+    frame: pd.DataFrame
+    version: int
+    watermark: Optional[str]
+    saved_at: float
+    last_full_sync: float
+
+def _feather():
+    """
+    Import pyarrow.feather, or None if pyarrow is not installed.
+    """
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    return feather
+
+def _snapshot_path(columns: Optional[Iterable[str]]):
+    """
+    Get the snapshot file path for a column projection.
+    """
+    if columns is None:
+        name = 'products_all'
+    else:
+        digest = hashlib.sha1(','.join(sorted(columns)).encode('utf-8')).hexdigest()[:12]
+        name = f'products_{digest}'
+    return os.path.join(SNAPSHOT_DIR, name + '.feather')
+
+def save_snapshot(frame, columns, version, watermark, last_full_sync):
+    """
+    Persist a product frame atomically.
+    
+    Args:
+        frame: Normalized product DataFrame
+        columns: Projection the frame was loaded with (None for all columns)
+        version: Dataset version of the frame
+        watermark: Delta sync high-water mark
+        last_full_sync: Unix timestamp of the last full reconciliation
+    
+    Returns:
+        bool: True if the snapshot was written
+    """
+    feather = _feather()
+    if not SNAPSHOTS_ENABLED or feather is None:
+        return False
+    import pyarrow as pa
+    
+    path = _snapshot_path(columns)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    
+    table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+    meta = json.dumps({
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'watermark': watermark,
+        'saved_at': time.time(),
+        'last_full_sync': last_full_sync,
+        'columns': None if columns is None else sorted(columns),
+    })
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: meta.encode('utf-8')})
+    
+    # Write to a temporary file and rename, so readers never see a partial snapshot
+    feather.write_feather(table, path + '.tmp', compression='uncompressed')
+    os.replace(path + '.tmp', path)
+    return True
+
+def load_snapshot(columns) -> Optional[Snapshot]:
+    """
+    Load the persisted frame for a column projection. The file is
+    memory-mapped and converted to pandas in one pass (the frame is a copy,
+    so the file can be replaced while it is in use).
+    
+    Args:
+        columns: Projection to restore (None for all columns)
+    
+    Returns:
+        Snapshot or None: The snapshot, or None if there is none (or it
+            can't be read, or was written in another format or for another
+            projection)
+    """
+    feather = _feather()
+    if not SNAPSHOTS_ENABLED or feather is None:
+        return None
+    
+    path = _snapshot_path(columns)
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {})[_META_KEY])
+        if meta.get('format') != SNAPSHOT_FORMAT or meta.get('columns') != (None if columns is None else sorted(columns)):
+            print(f"Ignoring outdated product snapshot {path}")
+            return None
+        frame = table.to_pandas()
+    except Exception as e:
+        print(f"Error reading product snapshot {path}: {e}")
+        return None
+    
+    return Snapshot(
+        frame=frame,
+        version=int(meta['version']),
+        watermark=meta.get('watermark'),
+        saved_at=float(meta['saved_at']),
+        last_full_sync=float(meta.get('last_full_sync', 0.0)),
+    )
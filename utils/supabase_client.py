@@ -1,15 +1,91 @@
 """
-Supabase client singleton for the Streamlit app.
+Supabase clients for the Streamlit app.
+
+The shared client (get_supabase_client) serves the catalog queries every
+session makes. Each browser session gets its own lightweight client for
+authentication (get_session_client), so users signing in or refreshing
+tokens never overwrite each other's auth state. All of them send their
+requests through one pooled, keep-alive HTTP client, and session clients
+left idle for SUPABASE_SESSION_IDLE_SECONDS are evicted.
 """
+import asyncio
 import os
-from supabase import create_client, Client
-from typing import Optional
+import threading
+import time
+from supabase import create_client, Client, ClientOptions
+from typing import Callable, Dict, Optional, Tuple
+
+import httpx
+
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+SESSION_IDLE_SECONDS = int(os.getenv("SUPABASE_SESSION_IDLE_SECONDS", "1800"))
 
 _supabase_client: Optional[Client] = None
+_http_client: Optional[httpx.Client] = None
+# Session key -> (last used, client)
+_session_clients: Dict[str, Tuple[float, Client]] = {}
+_session_factory: Optional[Callable[[], Client]] = None
+# Replacement for the async client of utils.async_data
+_async_client_override = None
+_clients_lock = threading.Lock()
+
+def get_supabase_credentials() -> Tuple[str, str]:
+    """
+    Read the Supabase project URL and API key from the environment.
+    
+    Returns:
+        tuple: (url, key)
+    """
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    
+    if not supabase_url or not supabase_key:
+        raise ValueError(
+            "SUPABASE_URL and SUPABASE_KEY must be set in environment variables or Streamlit secrets"
+        )
+    
+    return supabase_url, supabase_key
+
+def get_http_client() -> httpx.Client:
+    """
+    Get or create the HTTP connection pool shared by every sync client.
+    
+    Returns:
+        httpx.Client: Pooled, keep-alive HTTP client
+    """
+    global _http_client
+    
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS),
+                follow_redirects=True,
+            )
+    return _http_client
+
+def _create_client(access_token: Optional[str] = None) -> Client:
+    """
+    Create a client on the shared connection pool. Tokens are refreshed by
+    utils.auth_session, so the client's own refresh timer is disabled.
+    
+    Args:
+        access_token: User access token to send instead of the API key
+    """
+    supabase_url, supabase_key = get_supabase_credentials()
+    options = ClientOptions(
+        httpx_client=get_http_client(),
+        auto_refresh_token=False,
+        persist_session=False,
+        headers={'Authorization': f"Bearer {access_token}"} if access_token else {},
+    )
+    return create_client(supabase_url, supabase_key, options=options)
 
 def get_supabase_client() -> Client:
     """
-    Get or create Supabase client singleton.
+    Get or create the shared Supabase client, for queries that don't depend
+    on the signed-in user. Never sign in with it.
     
     Returns:
         Supabase client instance
@@ -17,14 +93,116 @@ def get_supabase_client() -> Client:
     global _supabase_client
     
     if _supabase_client is None:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            raise ValueError(
-                "SUPABASE_URL and SUPABASE_KEY must be set in environment variables or Streamlit secrets"
-            )
-        
-        _supabase_client = create_client(supabase_url, supabase_key)
+        _supabase_client = _create_client()
     
     return _supabase_client
+
+def get_session_client(session_key: str, access_token: Optional[str] = None) -> Client:
+    """
+    Get or create the client of one browser session, and evict the clients
+    of sessions idle for longer than SESSION_IDLE_SECONDS.
+    
+    Args:
+        session_key: Unique key of the session
+        access_token: Token of the session's user, sent by a newly created
+            client (an evicted session's client is recreated signed in)
+    
+    Returns:
+        Supabase client for this session only
+    """
+    now = time.time()
+    
+    with _clients_lock:
+        for key in [key for key, (last_used, _) in _session_clients.items() if now - last_used > SESSION_IDLE_SECONDS]:
+            del _session_clients[key]
+        
+        entry = _session_clients.get(session_key)
+        if entry is not None:
+            _session_clients[session_key] = (now, entry[1])
+            return entry[1]
+        factory = _session_factory
+    
+    client = factory() if factory is not None else _create_client(access_token)
+    
+    with _clients_lock:
+        # Another rerun of the same session may have created one meanwhile
+        entry = _session_clients.setdefault(session_key, (now, client))
+    return entry[1]
+
+def drop_session_client(session_key: str) -> None:
+    """
+    Forget a session's client, e.g. after signing out.
+    """
+    with _clients_lock:
+        _session_clients.pop(session_key, None)
+
+def session_client_count() -> int:
+    """
+    Number of session clients currently kept.
+    """
+    with _clients_lock:
+        return len(_session_clients)
+
+def set_supabase_client(client, session_factory: Optional[Callable[[], Client]] = None, async_client=None) -> None:
+    """
+    Replace the shared client, e.g. with utils.fake_supabase.FakeSupabaseClient
+    for offline runs and benchmarks.
+    
+    Args:
+        client: Client to return from get_supabase_client (None to recreate
+            the real one on next use)
+        session_factory: Creates the per-session clients (None for real
+            clients, or for sharing the replacement client when one is given)
+        async_client: Client for utils.async_data (None for the real one, or
+            for running the replacement client's queries on worker threads
+            when one is given)
+    """
+    global _supabase_client, _session_factory, _async_client_override
+    
+    with _clients_lock:
+        _supabase_client = client
+        if session_factory is None and client is not None:
+            session_factory = lambda: client
+        _session_factory = session_factory
+        if async_client is None and client is not None:
+            async_client = ThreadedAsyncClient(client)
+        _async_client_override = async_client
+        _session_clients.clear()
+
+def get_async_client_override():
+    """
+    Get the async client set with set_supabase_client, or None when the
+    real one is used.
+    """
+    with _clients_lock:
+        return _async_client_override
+
+class ThreadedAsyncClient:
+    """
+    Async facade over a sync client, with the interface utils.async_data
+    uses: queries are built on the sync client and executed on worker threads.
+    """
+    
+    def __init__(self, client):
+        self._client = client
+    
+    def from_(self, table):
+        return _ThreadedQuery(self._client.table(table))
+    
+    def rpc(self, fn, params=None):
+        return _ThreadedQuery(self._client.rpc(fn, params or {}))
+
+class _ThreadedQuery:
+    """
+    Chainable wrapper of a sync query builder whose execute() is awaitable.
+    """
+    
+    def __init__(self, query):
+        self._query = query
+    
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+        return lambda *args, **kwargs: _ThreadedQuery(method(*args, **kwargs))
+    
+    async def execute(self):
+        return await asyncio.to_thread(self._query.execute)
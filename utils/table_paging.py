@@ -0,0 +1,105 @@
+"""
+Paged rendering helpers for the product table: cached sort orders and page
+slicing, so only the visible rows are ever copied and sent to the browser.
+"""
+import math
+import threading
+
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Sort orders per (dataset version, column, direction), oldest evicted first
+_ORDER_CACHE_SIZE = 16
+_order_cache = {}
+_order_lock = threading.Lock()
+
+def sort_order(values, descending=False):
+    """
+    Compute the row positions of a column in sorted order.
+    Missing values sort last in both directions; ties keep row order.
+    
+    Args:
+        values: pandas.Series to sort by
+        descending: Sort direction
+    
+    Returns:
+        numpy.ndarray: Row positions (0..n-1) in sorted order
+    """
+    values = values.reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Categories are kept in load order, not alphabetically
+        values = values.astype(object)
+    ordered = values.sort_values(ascending=not descending, kind='stable', na_position='last')
+    return ordered.index.to_numpy()
+
+def get_sort_order(dataset, column, descending=False):
+    """
+    Get the sorted row positions of a cached dataset, computed at most once
+    per dataset version, column and direction.
+    
+    Args:
+        dataset: CachedDataset from utils.data_fetcher
+        column: Column to sort by
+        descending: Sort direction
+    
+    Returns:
+        numpy.ndarray: Row positions of dataset.frame in sorted order (read-only)
+    """
+    key = (dataset.version, column, descending)
+    
+    with _order_lock:
+        order = _order_cache.get(key)
+    if order is not None:
+        return order
+    
+    order = sort_order(dataset.frame[column], descending=descending)
+    order.flags.writeable = False
+    
+    with _order_lock:
+        _order_cache[key] = order
+        while len(_order_cache) > _ORDER_CACHE_SIZE:
+            del _order_cache[next(iter(_order_cache))]
+    return order
+
+def page_count(total, page_size):
+    """
+    Number of pages needed for total rows (at least 1).
+    """
+    return max(1, math.ceil(total / page_size))
+
+def sorted_positions(order, mask=None):
+    """
+    Restrict a sort order to the rows selected by a filter.
+    
+    Args:
+        order: Sorted row positions, see get_sort_order
+        mask: Boolean numpy array over the rows, or None for all rows
+    
+    Returns:
+        numpy.ndarray: Positions of the selected rows, in sorted order
+    """
+    if mask is None:
+        return order
+    return order[mask[order]]
+
+def page_rows(frame, positions, page, page_size, columns=None):
+    """
+    Materialize one page of rows.
+    
+    Args:
+        frame: Product DataFrame the positions refer to
+        positions: Row positions in display order, see sorted_positions
+        page: 1-based page number
+        page_size: Rows per page
+        columns: Columns to keep, or None for all columns
+    
+    Returns:
+        pandas.DataFrame: Copy of the rows on the page (only the requested
+            columns are copied)
+    """
+    start = (page - 1) * page_size
+    rows = positions[start:start + page_size]
+    if columns is None:
+        return frame.iloc[rows]
+    return frame.iloc[rows, frame.columns.get_indexer(columns)]